@@ -0,0 +1,71 @@
+"""
+Latency of small uploads to the nwss.aio reference server while a large
+upload is being validated, with the server's chunked validation and with
+each upload validated as a single chunk, as a handler calling
+schema.load on the whole upload would.
+
+    python benchmarks/bench_aio.py [LARGE_ROWS]
+"""
+import asyncio
+import csv
+import io
+import sys
+import time
+
+from synthetic import iter_rows
+
+from nwss.aio import Server
+
+
+def to_csv(rows):
+    f = io.StringIO()
+    writer = csv.DictWriter(f, list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return f.getvalue().encode('utf-8')
+
+
+async def upload(port, body):
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(
+        f'POST /validate HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n'
+        .encode('latin-1') + body
+    )
+    await writer.drain()
+    await reader.read()
+    writer.close()
+    return time.perf_counter() - start
+
+
+async def run(large, small, chunk_size):
+    server = Server(workers=1, chunk_size=chunk_size)
+    listening = await server.serve(port=0)
+    port = listening.sockets[0].getsockname()[1]
+
+    try:
+        async with listening:
+            alone = await upload(port, small)
+
+            large_upload = asyncio.create_task(upload(port, large))
+            await asyncio.sleep(0.5)
+            concurrent = await asyncio.gather(*(upload(port, small) for _ in range(10)))
+
+            return alone, max(concurrent), await large_upload
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    large = to_csv(list(iter_rows(n, error_rate=0.05, seed=1)))
+    small = to_csv(list(iter_rows(100, error_rate=0.05, seed=2)))
+
+    print(f'1 upload of {n} rows, then 10 concurrent uploads of 100 rows, 1 thread')
+
+    for label, chunk_size in [('chunks of 1000 rows', 1000), ('one chunk per upload', n)]:
+        alone, concurrent, total = asyncio.run(run(large, small, chunk_size))
+        print(f'{label}:')
+        print(f'  small upload, idle server:   {alone:7.3f}s')
+        print(f'  slowest small upload:        {concurrent:7.3f}s')
+        print(f'  large upload:                {total:7.3f}s')
@@ -0,0 +1,55 @@
+"""
+Compare iter_load without a cache, on a cold cache and on a warm one, as
+when a lab resubmits a cumulative file.
+
+    python benchmarks/bench_cache.py [ROWS]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+from nwss.cache import MemoryCache, SQLiteCache
+from nwss.schemas import WaterSampleSchema
+
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), '..', 'tests', 'fixtures', 'valid_data.csv'
+)
+
+
+def make_rows(n):
+    with open(FIXTURE) as f:
+        fixture = list(csv.DictReader(f))
+
+    # Distinct sample_ids, so every row has its own cache entry.
+    return [
+        dict(fixture[i % len(fixture)], sample_id=f'sample-{i}')
+        for i in range(n)
+    ]
+
+
+def timed(schema, rows):
+    start = time.perf_counter()
+    for _ in schema.iter_load(rows):
+        pass
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rows = make_rows(n)
+
+    print(f'{n} rows')
+    print(f'no cache:      {timed(WaterSampleSchema(), rows):.3f}s')
+
+    memory = WaterSampleSchema(cache=MemoryCache())
+    print(f'memory, cold:  {timed(memory, rows):.3f}s')
+    print(f'memory, warm:  {timed(memory, rows):.3f}s')
+
+    with tempfile.TemporaryDirectory() as directory:
+        with SQLiteCache(os.path.join(directory, 'cache.sqlite')) as backend:
+            sqlite = WaterSampleSchema(cache=backend)
+            print(f'sqlite, cold:  {timed(sqlite, rows):.3f}s')
+            print(f'sqlite, warm:  {timed(sqlite, rows):.3f}s')
@@ -0,0 +1,84 @@
+"""
+Measure the memory that WaterSampleSchema.cast_to_none allocates, with the
+default copying hook and with normalize_in_place.
+
+Rows are read from the valid CSV fixture, where optional columns are empty
+strings. Sizes are tracemalloc peaks of running the hook over every row and
+keeping the results, as Schema.load does. Full loads are timed without
+tracemalloc, which slows marshmallow down too much to be useful.
+
+    python benchmarks/bench_cast_to_none.py [ROWS]
+"""
+import csv
+import os
+import sys
+import time
+import tracemalloc
+
+from nwss.schemas import WaterSampleSchema
+
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), '..', 'tests', 'fixtures', 'valid_data.csv'
+)
+
+
+def make_rows(n):
+    with open(FIXTURE) as f:
+        fixture = list(csv.DictReader(f))
+
+    return [dict(fixture[i % len(fixture)]) for i in range(n)]
+
+
+def timed(function, rows):
+    start = time.perf_counter()
+    function(rows)
+    return time.perf_counter() - start
+
+
+def measure(function, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(rows)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak, elapsed
+
+
+def cast_each(schema):
+    def run(rows):
+        return [schema.cast_to_none(row) for row in rows]
+
+    return run
+
+
+def legacy_cast_each(rows):
+    return [{k: v if v != '' else None for k, v in row.items()} for row in rows]
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    mib = 1024 * 1024
+
+    cases = [
+        ('copying (before)', legacy_cast_each),
+        ('copying', cast_each(WaterSampleSchema())),
+        ('in place', cast_each(WaterSampleSchema(normalize_in_place=True))),
+    ]
+
+    print(f'{n} rows, cast_to_none')
+
+    for name, function in cases:
+        # In-place cases modify their rows, so every case gets fresh ones.
+        peak, elapsed = measure(function, make_rows(n))
+        print(f'  {name:18} peak {peak / mib:7.1f} MiB  {elapsed:6.2f}s')
+
+    print(f'{n} rows, WaterSampleSchema(many=True).load')
+
+    for name, schema in [
+        ('copying', WaterSampleSchema(many=True)),
+        ('in place', WaterSampleSchema(many=True, normalize_in_place=True)),
+    ]:
+        print(f'  {name:18} {timed(schema.load, make_rows(n)):6.2f}s')
@@ -0,0 +1,77 @@
+"""
+Compare WaterSampleSchema.iter_load with nwss.columnar.validate_columns,
+on string columns (as read from CSV) and on typed columns (as read from
+Parquet or Arrow).
+
+    python benchmarks/bench_columnar.py [ROWS]
+"""
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+from nwss.columnar import validate_columns
+from nwss.schemas import WaterSampleSchema
+
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), '..', 'tests', 'fixtures', 'valid_data.csv'
+)
+
+NUMERIC = [
+    'population_served', 'sewage_travel_time', 'capacity_mgd', 'industrial_input',
+    'collection_storage_time', 'collection_storage_temp', 'pre_conc_storage_time',
+    'pre_conc_storage_temp', 'pre_ext_storage_time', 'pre_ext_storage_temp',
+    'tot_conc_vol', 'rec_eff_percent', 'rec_eff_spike_conc', 'hum_frac_mic_conc',
+    'hum_frac_chem_conc', 'other_norm_conc', 'flow_rate', 'ph', 'conductivity',
+    'tss', 'collection_water_temp', 'equiv_sewage_amt', 'sars_cov2_avg_conc',
+    'sars_cov2_std_error', 'sars_cov2_cl_95_lo', 'sars_cov2_cl_95_up', 'lod_sewage',
+]
+
+DATES = ['sample_collect_date', 'test_result_date']
+
+
+def make_rows(n):
+    with open(FIXTURE) as f:
+        fixture = list(csv.DictReader(f))
+
+    return [dict(fixture[i % len(fixture)]) for i in range(n)]
+
+
+def to_columns(rows, typed):
+    columns = {
+        key: np.array([row[key] for row in rows], dtype=object) for key in rows[0]
+    }
+
+    if typed:
+        for key in NUMERIC:
+            columns[key] = np.array(
+                [float(v) if v else np.nan for v in columns[key]]
+            )
+        for key in DATES:
+            columns[key] = columns[key].astype('datetime64[D]')
+
+    return columns
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rows = make_rows(n)
+    schema = WaterSampleSchema()
+
+    row_time = timed(lambda: list(schema.iter_load(rows)))
+    string_time = timed(validate_columns, to_columns(rows, typed=False))
+    typed_time = timed(validate_columns, to_columns(rows, typed=True))
+
+    print(f'{n} rows')
+    print(f'iter_load:              {row_time:.3f}s')
+    print(f'columns, strings:       {string_time:.3f}s ({row_time / string_time:.1f}x)')
+    print(f'columns, typed:         {typed_time:.3f}s ({row_time / typed_time:.1f}x)')
@@ -0,0 +1,49 @@
+"""
+Compare WaterSampleSchema.load with the compiled load function from
+nwss.compiler on the same rows.
+
+    python benchmarks/bench_compiler.py [ROWS]
+"""
+import csv
+import os
+import sys
+import time
+
+from nwss.compiler import compile_schema
+from nwss.schemas import WaterSampleSchema
+
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), '..', 'tests', 'fixtures', 'valid_data.csv'
+)
+
+
+def make_rows(n):
+    with open(FIXTURE) as f:
+        fixture = list(csv.DictReader(f))
+
+    return [dict(fixture[i % len(fixture)]) for i in range(n)]
+
+
+def timed(load, rows):
+    start = time.perf_counter()
+    load(rows)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rows = make_rows(n)
+
+    schema = WaterSampleSchema(many=True)
+    compiled = compile_schema(schema)
+
+    assert compiled.load(rows) == schema.load(rows)
+
+    marshmallow_time = timed(schema.load, rows)
+    compiled_time = timed(compiled.load, rows)
+
+    print(f'{n} rows')
+    print(f'marshmallow: {marshmallow_time:.3f}s ({n / marshmallow_time:,.0f} rows/s)')
+    print(f'compiled:    {compiled_time:.3f}s ({n / compiled_time:,.0f} rows/s)')
+    print(f'speedup:     {marshmallow_time / compiled_time:.2f}x')
@@ -0,0 +1,47 @@
+"""
+Show that importing nwss.dump_to_jsonschema does almost no work, and
+that the JSON schema is only built when get_schema() is first called.
+
+Each measurement runs in a fresh interpreter so nothing is cached.
+
+    python benchmarks/bench_import.py
+"""
+import subprocess
+import sys
+
+
+SCRIPT = '''
+import time
+
+start = time.perf_counter()
+import nwss
+package = time.perf_counter()
+import nwss.dump_to_jsonschema
+module = time.perf_counter()
+nwss.dump_to_jsonschema.get_schema()
+first = time.perf_counter()
+nwss.dump_to_jsonschema.get_schema()
+second = time.perf_counter()
+
+print(package - start, module - package, first - module, second - first)
+'''
+
+
+def run(repeat=5):
+    samples = []
+
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT])
+        samples.append([float(value) for value in output.split()])
+
+    # Take the best run for each step, to reduce noise.
+    return [min(step) for step in zip(*samples)]
+
+
+if __name__ == '__main__':
+    package, module, first, second = run()
+
+    print(f'import nwss:                      {package * 1000:8.2f} ms')
+    print(f'import nwss.dump_to_jsonschema:   {module * 1000:8.2f} ms')
+    print(f'first get_schema():               {first * 1000:8.2f} ms')
+    print(f'later get_schema():               {second * 1000:8.4f} ms')
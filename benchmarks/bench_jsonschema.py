@@ -0,0 +1,38 @@
+"""
+Per-request latency of jsonschema.validate, which checks the schema and
+builds a validator on every call, against the cached validator from
+nwss.dump_to_jsonschema.get_validator.
+
+    python benchmarks/bench_jsonschema.py
+"""
+import json
+import os
+import timeit
+
+import jsonschema
+
+from nwss.dump_to_jsonschema import get_validator, load_schema
+
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), '..', 'tests', 'fixtures', 'valid.json'
+)
+
+
+if __name__ == '__main__':
+    with open(FIXTURE) as f:
+        instance = json.load(f)
+
+    schema = load_schema()
+    validator = get_validator()
+    number = 200
+
+    uncached = timeit.timeit(
+        lambda: jsonschema.validate(instance=instance, schema=schema), number=number
+    )
+    cached = timeit.timeit(lambda: validator.validate(instance), number=number)
+
+    print(f'{len(instance)} rows per request')
+    print(f'jsonschema.validate: {uncached / number * 1000:8.3f} ms/request')
+    print(f'get_validator():     {cached / number * 1000:8.3f} ms/request '
+          f'({uncached / cached:.1f}x)')
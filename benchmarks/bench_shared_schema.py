@@ -0,0 +1,36 @@
+"""
+Per-request setup time of building WaterSampleSchema(many=True) against
+nwss.schemas.shared_schema(many=True), and what it adds to a small
+request.
+
+    python benchmarks/bench_shared_schema.py [ROWS_PER_REQUEST]
+"""
+import sys
+import timeit
+
+from synthetic import iter_rows
+
+from nwss.schemas import WaterSampleSchema, shared_schema
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rows = list(iter_rows(n, seed=1))
+    number = 500
+
+    built = timeit.timeit(lambda: WaterSampleSchema(many=True), number=number)
+    shared = timeit.timeit(lambda: shared_schema(many=True), number=number)
+
+    request_built = timeit.timeit(
+        lambda: WaterSampleSchema(many=True).load(rows), number=number
+    )
+    request_shared = timeit.timeit(
+        lambda: shared_schema(many=True).load(rows), number=number
+    )
+
+    print(f'schema setup, built:   {built / number * 1000:8.3f} ms/request')
+    print(f'schema setup, shared:  {shared / number * 1000:8.3f} ms/request '
+          f'({built / shared:.0f}x)')
+    print(f'{n}-row request, built:  {request_built / number * 1000:8.3f} ms')
+    print(f'{n}-row request, shared: {request_shared / number * 1000:8.3f} ms '
+          f'({request_built / request_shared:.2f}x)')
@@ -0,0 +1,145 @@
+"""
+Throughput of loading, dumping and JSON schema validation on synthetic
+submissions of 1k, 100k and 1M rows, compared with a stored baseline.
+
+Rows come from synthetic.iter_rows and are generated a chunk at a time,
+outside the timed sections, so memory use stays flat at any size. Each
+chunk is loaded with WaterSampleSchema.iter_load, its valid rows are
+dumped with WaterSampleSchema.dump(many=True), and the dumped rows are
+checked with the validator from nwss.dump_to_jsonschema.get_validator.
+
+    python benchmarks/bench_suite.py                  # compare with baseline.json
+    python benchmarks/bench_suite.py --sizes 1000 100000
+    python benchmarks/bench_suite.py --save           # record a new baseline
+
+Exits with status 1 if any timing is more than --tolerance times slower
+than the baseline. Baselines are only comparable on the same machine.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+from synthetic import iter_rows
+
+from nwss.dump_to_jsonschema import get_validator
+from nwss.schemas import WaterSampleSchema
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+BENCHMARKS = ['load', 'dump', 'jsonschema']
+
+
+def run(n, error_rate, seed, chunk_size):
+    '''
+    Return ({benchmark: seconds}, number of invalid rows) for n rows.
+    '''
+    schema = WaterSampleSchema()
+    validator = get_validator()
+    timings = dict.fromkeys(BENCHMARKS, 0.0)
+    n_invalid = 0
+
+    rows = iter_rows(n, error_rate=error_rate, seed=seed)
+
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+
+        if not chunk:
+            break
+
+        start = time.perf_counter()
+        results = list(schema.iter_load(chunk))
+        timings['load'] += time.perf_counter() - start
+
+        valid = [data for _, data, errors in results if not errors]
+        n_invalid += len(results) - len(valid)
+
+        start = time.perf_counter()
+        dumped = schema.dump(valid, many=True)
+        timings['dump'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        errors = list(validator.iter_errors(dumped))
+        timings['jsonschema'] += time.perf_counter() - start
+
+        # The generator's valid rows must pass both schemas alike.
+        if errors:
+            raise AssertionError(f'Loaded rows fail the JSON schema: {errors[0]}')
+
+    return timings, n_invalid
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Print each timing against the baseline and return the number that are
+    more than tolerance times slower.
+    '''
+    regressions = 0
+
+    for size, timings in results.items():
+        for name, seconds in timings.items():
+            before = baseline.get(size, {}).get(name)
+
+            if before is None:
+                continue
+
+            ratio = seconds / before
+            flag = ''
+
+            if ratio > tolerance:
+                regressions += 1
+                flag = '  slower'
+
+            print(f'{size:>8} {name:<11} {before:9.3f}s -> {seconds:9.3f}s '
+                  f'({ratio:.2f}x){flag}')
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help='Write the results to the baseline file.')
+    parser.add_argument('--tolerance', type=float, default=1.15)
+    args = parser.parse_args()
+
+    results = {}
+
+    for n in args.sizes:
+        timings, n_invalid = run(n, args.error_rate, args.seed, args.chunk_size)
+        results[str(n)] = timings
+
+        print(f'{n} rows, {n_invalid} invalid')
+        for name, seconds in timings.items():
+            print(f'  {name:<11} {seconds:9.3f}s {n / seconds:10.0f} rows/s')
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'error_rate': args.error_rate,
+                'seed': args.seed,
+                'results': results,
+            }, f, indent=4)
+            f.write('\n')
+        print(f'Saved {args.baseline}')
+
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if (baseline['error_rate'], baseline['seed']) != (args.error_rate, args.seed):
+            print('The baseline was run with another --error-rate or --seed.')
+
+        print(f'\nAgainst {args.baseline}:')
+        sys.exit(1 if compare(results, baseline['results'], args.tolerance) else 0)
@@ -0,0 +1,41 @@
+"""
+Per-cell cost of CaseInsensitiveOneOf, before and after folding the
+allowed values at construction time.
+
+    python benchmarks/bench_validators.py
+"""
+import timeit
+
+from marshmallow import ValidationError
+
+from nwss import value_sets
+from nwss.validators import CaseInsensitiveOneOf
+
+
+def linear_scan(choices, value):
+    # The previous implementation: casefold every choice for every value.
+    if not any(value.casefold() == v.casefold() for v in choices):
+        raise ValidationError('Must be one of: ...')
+    return value
+
+
+def bench(name, choices, value, number=100000):
+    validator = CaseInsensitiveOneOf(choices)
+
+    before = timeit.timeit(lambda: linear_scan(choices, value), number=number)
+    after = timeit.timeit(lambda: validator(value), number=number)
+
+    print(f'{name:<24} {value!r:<32} '
+          f'before: {before / number * 1e9:8.0f} ns/cell   '
+          f'after: {after / number * 1e9:8.0f} ns/cell   '
+          f'({before / after:.1f}x)')
+
+
+if __name__ == '__main__':
+    # Best and worst case for the linear scan: first and last choice.
+    bench('reporting_jurisdiction', value_sets.reporting_jurisdiction, 'al')
+    bench('reporting_jurisdiction', value_sets.reporting_jurisdiction, 'wy')
+    bench('sample_type', value_sets.sample_type,
+          value_sets.sample_type[-1].upper())
+    bench('sars_cov2_units', value_sets.mic_chem_units,
+          value_sets.mic_chem_units[-1])
@@ -0,0 +1,243 @@
+"""
+Seeded generator of synthetic NWSS submissions for the benchmarks.
+
+Rows look like those of a csv.DictReader over a lab's export: every value
+is a string and empty cells are ''. Categorical values are drawn from
+nwss.value_sets, optional fields are left empty some of the time, and the
+cross-field rules of WaterSampleSchema hold, so a row is valid unless an
+error was injected into it. The same seed always gives the same rows.
+
+    from synthetic import iter_rows
+
+    for row in iter_rows(100000, error_rate=0.05, seed=1):
+        ...
+"""
+import datetime
+import random
+
+from nwss import rules, value_sets
+from nwss.schemas import WaterSampleSchema
+
+
+# Share of optional fields that are left empty, before rules fill them in.
+EMPTY_RATE = 0.3
+
+# Sample dates are drawn from a fixed window, so rows do not depend on
+# the day they are generated.
+FIRST_DATE = datetime.date(2021, 1, 1)
+DAYS = 730
+
+COUNTIES = ['Los Angeles', 'San Francisco', 'Cook', 'Harris', 'Maricopa', 'King']
+OTHER_JURISDICTIONS = ['San Bernardino', 'Navajo Nation', 'Fort Bragg']
+URLS = ['www.example.com', 'https://example.org/protocol.pdf']
+
+
+def _choice(values):
+    return lambda rng: rng.choice(values)
+
+
+def _number(low, high, digits=3):
+    # Never zero: rules count 0 as an empty value.
+    return lambda rng: str(round(rng.uniform(low, high), digits) or high)
+
+
+def _integer(low, high):
+    return lambda rng: str(rng.randint(low, high))
+
+
+def _text(alphabet, low, high):
+    return lambda rng: ''.join(rng.choices(alphabet, k=rng.randint(low, high)))
+
+
+_ALNUM = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+_DIGITS = '0123456789'
+
+
+def _epaid(rng):
+    return ''.join(rng.choices(_LETTERS, k=2) + rng.choices(_DIGITS, k=7))
+
+
+def _time(rng):
+    return f'{rng.randrange(24):02d}:{rng.randrange(60):02d}'
+
+
+def _time_zone(rng):
+    return f'utc-{rng.randint(4, 10):02d}:00'
+
+
+# Values for every field but the dates and ids, which depend on the row.
+FIELDS = {
+    'reporting_jurisdiction': _choice(value_sets.reporting_jurisdiction),
+    'county_names': lambda rng: ','.join(rng.sample(COUNTIES, rng.randint(1, 2))),
+    'other_jurisdiction': _choice(OTHER_JURISDICTIONS),
+    'zipcode': _text(_DIGITS, 5, 5),
+    'population_served': _integer(500, 5000000),
+    'sewage_travel_time': _number(0.5, 48, 1),
+    'sample_location': _choice(value_sets.sample_location),
+    'sample_location_specify': _text(_ALNUM + '_', 4, 20),
+    'institution_type': _choice(value_sets.institution_type),
+    'epaid': _epaid,
+    'wwtp_name': _text(_ALNUM + '_', 4, 20),
+    'wwtp_jurisdiction': _choice(value_sets.wwtp_jurisdictions),
+    'capacity_mgd': _number(0.1, 500, 1),
+    'industrial_input': _number(0.1, 100, 1),
+    'stormwater_input': _choice(value_sets.yes_no_empty),
+    'influent_equilibrated': _choice(value_sets.yes_no_empty),
+    'sample_type': _choice(value_sets.sample_type),
+    'composite_freq': _number(0.1, 24, 1),
+    'sample_matrix': _choice(value_sets.sample_matrix),
+    'collection_storage_time': _number(0.1, 72, 1),
+    'collection_storage_temp': _number(-20, 25, 1),
+    'pretreatment': _choice(value_sets.yes_no_empty),
+    'pretreatment_specify': _choice(['chemical', 'heat', 'chemical and heat']),
+    'solids_separation': _choice(value_sets.solids_separation),
+    'concentration_method': _choice(value_sets.concentration_method),
+    'extraction_method': _choice(value_sets.extraction_method),
+    'pre_conc_storage_time': _number(0.1, 72, 1),
+    'pre_conc_storage_temp': _number(-80, 25, 1),
+    'pre_ext_storage_time': _number(0.1, 72, 1),
+    'pre_ext_storage_temp': _number(-80, 25, 1),
+    'tot_conc_vol': _number(1, 500, 1),
+    'ext_blank': _choice(value_sets.yes_no_empty),
+    'rec_eff_target_name': _choice(value_sets.rec_eff_target_name),
+    'rec_eff_percent': lambda rng: rng.choice(['-1', _number(1, 100, 1)(rng)]),
+    'rec_eff_spike_matrix': _choice(value_sets.rec_eff_spike_matrix),
+    'rec_eff_spike_conc': _number(0.1, 8),
+    'pasteurized': _choice(value_sets.yes_no_empty),
+    'pcr_target': _choice(value_sets.pcr_target),
+    'pcr_target_ref': _choice(URLS),
+    'pcr_type': _choice(value_sets.pcr_type),
+    'lod_ref': _choice(URLS),
+    'hum_frac_mic_conc': _number(0.1, 1e6),
+    'hum_frac_mic_unit': _choice(value_sets.mic_units),
+    'hum_frac_target_mic': _choice(value_sets.hum_frac_target_mic),
+    'hum_frac_target_mic_ref': _choice(URLS),
+    'hum_frac_chem_conc': _number(0.1, 1e3),
+    'hum_frac_chem_unit': _choice(value_sets.chem_units),
+    'hum_frac_target_chem': _choice(value_sets.hum_frac_target_chem),
+    'hum_frac_target_chem_ref': _choice(URLS),
+    'other_norm_conc': _number(0.1, 1e3),
+    'other_norm_name': _choice(value_sets.other_norm_name),
+    'other_norm_unit': _choice(value_sets.mic_chem_units),
+    'other_norm_ref': _choice(URLS),
+    'quant_stan_type': _choice(value_sets.quant_stan_type),
+    'stan_ref': _choice(URLS),
+    'inhibition_detect': _choice(value_sets.yes_no_not_tested),
+    'inhibition_adjust': _choice(value_sets.yes_no_empty),
+    'inhibition_method': _choice(URLS),
+    'num_no_target_control': _choice(value_sets.num_no_target_control),
+    'sample_collect_time': _time,
+    'time_zone': _time_zone,
+    'flow_rate': _number(0.1, 500, 1),
+    'ph': _number(5, 9, 2),
+    'conductivity': _number(0.1, 2000, 2),
+    'tss': _number(0.1, 1000, 1),
+    'collection_water_temp': _number(0.1, 30, 1),
+    'equiv_sewage_amt': _number(0.1, 100),
+    'sars_cov2_units': _choice(value_sets.mic_chem_units),
+    'sars_cov2_avg_conc': _number(0.1, 1e6),
+    'sars_cov2_std_error': _number(0.1, 1e3),
+    'sars_cov2_cl_95_lo': _number(0.1, 1e5),
+    'sars_cov2_cl_95_up': _number(1e5, 1e6),
+    'ntc_amplify': _choice(value_sets.yes_no),
+    'sars_cov2_below_lod': _choice(value_sets.yes_no),
+    'lod_sewage': _number(0.1, 1e4),
+    'quality_flag': _choice(value_sets.yes_no_empty),
+}
+
+
+# Ways to make a valid row invalid, each failing a different kind of check.
+def _bad_category(rng, row):
+    row['sample_matrix'] = 'river water'
+
+
+def _out_of_range(rng, row):
+    row['capacity_mgd'] = '-5'
+
+
+def _bad_id(rng, row):
+    row['sample_id'] = row['sample_id'] + ' #'
+
+
+def _bad_date(rng, row):
+    row['sample_collect_date'] = '04/28/2021'
+
+
+def _future_date(rng, row):
+    row['test_result_date'] = '2999-01-01'
+
+
+def _missing_required(rng, row):
+    row['pcr_target'] = ''
+
+
+def _not_a_number(rng, row):
+    row['lod_sewage'] = 'n/a'
+
+
+def _broken_rule(rng, row):
+    row['inhibition_detect'] = 'not tested'
+    row['inhibition_method'] = URLS[0]
+
+
+ERRORS = [
+    _bad_category, _out_of_range, _bad_id, _bad_date, _future_date,
+    _missing_required, _not_a_number, _broken_rule,
+]
+
+
+def iter_rows(n, error_rate=0.0, seed=0):
+    '''
+    Yield n synthetic rows. A share of about error_rate of them has one
+    injected error each, such as a value outside its value set, a bad date
+    or a broken cross-field rule.
+    '''
+    rng = random.Random(seed)
+    schema = WaterSampleSchema()
+    required = {
+        field_obj.data_key or name
+        for name, field_obj in schema.load_fields.items()
+        if field_obj.required
+    }
+    conditional = [rule for _, rule in rules.schema_rules(schema)]
+
+    for i in range(n):
+        row = {
+            key: make(rng) if key in required or rng.random() > EMPTY_RATE else ''
+            for key, make in FIELDS.items()
+        }
+
+        collected = FIRST_DATE + datetime.timedelta(days=rng.randrange(DAYS))
+        tested = collected + datetime.timedelta(days=rng.randint(0, 7))
+        row['sample_collect_date'] = collected.isoformat()
+        row['test_result_date'] = tested.isoformat()
+        row['sample_id'] = f's{seed}-{i}'
+        row['lab_id'] = f'lab-{rng.randrange(200)}'
+
+        if not row['county_names']:
+            row['other_jurisdiction'] = FIELDS['other_jurisdiction'](rng)
+
+        _apply_rules(rng, row, conditional)
+
+        if rng.random() < error_rate:
+            rng.choice(ERRORS)(rng, row)
+
+        yield row
+
+
+def _apply_rules(rng, row, conditional):
+    # Fill in whatever a rule requires of the row. Rules are checked on the
+    # raw strings, which can only make a rule apply more often.
+    for rule in conditional:
+        if not any(condition.holds(row) for condition in rule.when):
+            continue
+
+        for condition in rule.then:
+            if condition.holds(row):
+                continue
+
+            if isinstance(condition, rules.OneOf):
+                row[condition.field] = condition.values[0]
+            else:
+                row[condition.field] = FIELDS[condition.field](rng)
@@ -1,5 +1,8 @@
 from nwss.schemas import WaterSampleSchema
 
 
+# Version of this package
+__version__ = '1.0.1'
+
 # Version of the CDC data dictionary this schema reflects
 CDC_VERSION = '2.0.4'
@@ -0,0 +1,305 @@
+'''
+Validate rows from asyncio code without blocking the event loop.
+
+validate_stream loads a stream of rows a chunk at a time in an executor
+and yields the results as each chunk finishes. A stream has one chunk
+being validated while the next is read, and reading stops while results
+wait to be consumed, so a large upload holds at most two chunks in memory.
+Streams sharing an executor take turns a chunk at a time, so a small
+upload is never stuck behind a large one.
+
+The module is also a small reference server built on asyncio streams:
+
+    python -m nwss.aio --port 8080
+    curl --data-binary @samples.csv http://localhost:8080/validate
+
+POST a CSV file to /validate. Errors are streamed back as JSON lines as
+they are found, followed by a summary line of row counts, or by an
+{"error": ...} line if the body is not UTF-8 CSV.
+'''
+import argparse
+import asyncio
+import codecs
+import collections
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from nwss.errors import flatten_errors
+from nwss.parallel import _load_shared_chunk
+from nwss.schemas import shared_schema
+
+
+async def validate_stream(rows, schema=None, chunk_size=1000, executor=None):
+    '''
+    Validate an async iterable, or plain iterable, of row dicts with schema,
+    by default nwss.schemas.shared_schema(), chunk_size rows at a time in
+    executor, by default the event loop's. Yields (row_index, data, errors)
+    tuples in input order, like WaterSampleSchema.iter_load, and every row
+    of the stream is checked against the same latest_date.
+    '''
+    loop = asyncio.get_running_loop()
+    schema = schema or shared_schema()
+    latest_date = schema.latest_date()
+    pending = None
+
+    async for start, chunk in _chunked(rows, chunk_size):
+        # The next chunk was read while this one was validated.
+        if pending is not None:
+            for result in await pending:
+                yield result
+
+        pending = loop.run_in_executor(
+            executor, _load_shared_chunk, schema, latest_date, start, chunk
+        )
+
+    if pending is not None:
+        for result in await pending:
+            yield result
+
+
+async def _chunked(rows, chunk_size):
+    if not hasattr(rows, '__aiter__'):
+        rows = _from_iterable(rows)
+
+    start = 0
+    chunk = []
+
+    async for row in rows:
+        chunk.append(row)
+
+        if len(chunk) == chunk_size:
+            yield start, chunk
+            start += chunk_size
+            chunk = []
+
+    if chunk:
+        yield start, chunk
+
+
+async def _from_iterable(rows):
+    for row in rows:
+        yield row
+
+
+class _Lines():
+    # An iterator csv.DictReader can keep reading from as lines arrive:
+    # it stops when the lines run out and resumes when more are added.
+
+    def __init__(self):
+        self.lines = collections.deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+
+        return self.lines.popleft()
+
+
+async def read_csv(reader, length, block_size=65536):
+    '''
+    Yield the rows of length bytes of CSV from an asyncio StreamReader as
+    dicts, like csv.DictReader, as they arrive.
+    '''
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    lines = _Lines()
+    rows = csv.DictReader(lines)
+    record = ''
+    quoted = False
+    remaining = length
+
+    while remaining > 0:
+        block = await reader.read(min(block_size, remaining))
+
+        if not block:
+            raise ConnectionError('The request body ended early.')
+
+        remaining -= len(block)
+        text = decoder.decode(block, final=remaining == 0)
+
+        for line in text.splitlines(keepends=True):
+            record += line
+
+            if '"' in line:
+                quoted = _ends_quoted(line, quoted)
+
+            # A record ends at a line break outside quotes.
+            if line[-1:] in ('\n', '\r') and not quoted:
+                lines.lines.append(record)
+                record = ''
+
+        for row in rows:
+            yield row
+
+    if record:
+        lines.lines.append(record)
+
+    for row in rows:
+        yield row
+
+
+_START, _FIELD, _QUOTED, _QUOTE = range(4)
+
+
+def _ends_quoted(line, quoted):
+    # Whether a line ends inside a quoted field, read the way the csv
+    # module reads it, given whether it started inside one.
+    state = _QUOTED if quoted else _START
+
+    for char in line:
+        if state == _START:
+            if char == '"':
+                state = _QUOTED
+            elif char != ',':
+                state = _FIELD
+        elif state == _FIELD:
+            if char == ',':
+                state = _START
+        elif state == _QUOTED:
+            if char == '"':
+                state = _QUOTE
+        elif char == '"':
+            # A doubled quote inside a quoted field.
+            state = _QUOTED
+        else:
+            state = _START if char == ',' else _FIELD
+
+    return state == _QUOTED
+
+
+class Server():
+    '''
+    The reference validation server. Uploads are validated concurrently
+    with one shared schema, on a pool of worker threads.
+    '''
+
+    def __init__(self, workers=None, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.schema = shared_schema()
+        self.executor = ThreadPoolExecutor(workers)
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            method, path, _ = request.decode('latin-1').split(' ', 2)
+            headers = {}
+
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+
+                if not line:
+                    break
+
+                key, _, value = line.partition(':')
+                headers[key.strip().lower()] = value.strip()
+
+            if path != '/validate':
+                await self._respond(writer, '404 Not Found')
+            elif method != 'POST':
+                await self._respond(writer, '405 Method Not Allowed')
+            elif not headers.get('content-length', '').isdigit():
+                await self._respond(writer, '411 Length Required')
+            else:
+                await self._validate(reader, writer, int(headers['content-length']))
+        except ValueError:
+            await self._respond(writer, '400 Bad Request')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status):
+        writer.write(
+            f'HTTP/1.1 {status}\r\nContent-Length: 0\r\n'
+            'Connection: close\r\n\r\n'.encode('latin-1')
+        )
+        await writer.drain()
+
+    async def _validate(self, reader, writer, length):
+        writer.write(
+            b'HTTP/1.1 200 OK\r\n'
+            b'Content-Type: application/x-ndjson\r\n'
+            b'Transfer-Encoding: chunked\r\n'
+            b'Connection: close\r\n\r\n'
+        )
+
+        n_rows = n_invalid = 0
+
+        try:
+            async for index, data, errors in validate_stream(
+                read_csv(reader, length),
+                schema=self.schema,
+                chunk_size=self.chunk_size,
+                executor=self.executor
+            ):
+                n_rows += 1
+
+                if errors:
+                    n_invalid += 1
+                    self._write_chunk(writer, ''.join(
+                        json.dumps(error._asdict()) + '\n'
+                        for error in flatten_errors(index, errors)
+                    ))
+                    await writer.drain()
+        except (ValueError, csv.Error) as error:
+            # The 200 status line has been sent, so end the stream with
+            # the error instead of the summary.
+            self._write_chunk(writer, json.dumps({
+                'error': f'The request body could not be read as CSV: {error}'
+            }) + '\n')
+        else:
+            self._write_chunk(writer, json.dumps({
+                'rows': n_rows, 'valid': n_rows - n_invalid, 'invalid': n_invalid
+            }) + '\n')
+
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    def _write_chunk(self, writer, text):
+        data = text.encode('utf-8')
+        writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        '''Start listening and return the asyncio server.'''
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+async def _serve_forever(args):
+    server = Server(workers=args.workers, chunk_size=args.chunk_size)
+
+    try:
+        listening = await server.serve(args.host, args.port)
+        print(f'Listening on http://{args.host}:{args.port}/validate')
+
+        async with listening:
+            await listening.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m nwss.aio',
+        description='Serve NWSS validation over HTTP: POST a CSV file to '
+                    '/validate to get its errors back as JSON lines.'
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, help='Validation threads.')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_serve_forever(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+'''
+Write validated records to Apache Arrow tables and Parquet files
+(pip install nwss[arrow]).
+
+The Arrow schema is fixed by the marshmallow fields, so every file has the
+same column types however many values are missing: floats are float64,
+integers int64, dates date32 and times time64. Categorical fields are
+dictionary encoded, with their values in nwss.value_sets as the
+dictionary, so each cell is stored as a small integer index.
+'''
+from marshmallow import fields
+
+from nwss import fields as nwss_fields
+from nwss.schemas import WaterSampleSchema
+
+
+def arrow_schema(schema=None):
+    '''
+    Return the pyarrow schema for records loaded with schema, by default
+    a WaterSampleSchema.
+    '''
+    return _Converter(schema or WaterSampleSchema()).arrow_schema
+
+
+def to_table(records, schema=None):
+    '''
+    Return a pyarrow Table of records loaded with schema, by default a
+    WaterSampleSchema.
+    '''
+    return _Converter(schema or WaterSampleSchema()).to_table(records)
+
+
+class ArrowWriter():
+    '''
+    Write batches of validated records to a Parquet file, or an Arrow IPC
+    file with format='arrow', as they are loaded. Use it as a context
+    manager, or call close when done.
+    '''
+
+    def __init__(self, where, schema=None, format='parquet'):
+        import pyarrow as pa
+
+        self._converter = _Converter(schema or WaterSampleSchema())
+
+        if format == 'parquet':
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(where, self._converter.arrow_schema)
+        elif format == 'arrow':
+            self._writer = pa.ipc.new_file(where, self._converter.arrow_schema)
+        else:
+            raise ValueError(f"format must be 'parquet' or 'arrow', not {format!r}.")
+
+    def write(self, records):
+        '''Write a batch of records loaded with the writer's schema.'''
+        self._writer.write_table(self._converter.to_table(records))
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Converter():
+    def __init__(self, schema):
+        import pyarrow as pa
+
+        self._pa = pa
+        self._columns = []
+
+        for name, field_obj in schema.load_fields.items():
+            key = field_obj.attribute or name
+            arrow_type, dictionary = self._arrow_type(field_obj)
+            self._columns.append((key, arrow_type, dictionary))
+
+        self.arrow_schema = pa.schema([
+            pa.field(key, arrow_type) for key, arrow_type, _ in self._columns
+        ])
+
+    def _arrow_type(self, field_obj):
+        pa = self._pa
+
+        if isinstance(field_obj, nwss_fields.CategoricalString):
+            # The official spellings, in the order of nwss.value_sets.
+            canonical = field_obj.allowed_values.canonical_choices
+            choices = list(dict.fromkeys(canonical.values()))
+            index_type = pa.int8() if len(choices) <= 127 else pa.int16()
+            dictionary = (
+                pa.array(choices, type=pa.string()),
+                {choice.casefold(): i for i, choice in enumerate(choices)},
+            )
+            return pa.dictionary(index_type, pa.string()), dictionary
+
+        if isinstance(field_obj, nwss_fields.ListString):
+            return pa.list_(pa.string()), None
+
+        for field_class, arrow_type in [
+            (fields.String, pa.string()),
+            (fields.Boolean, pa.bool_()),
+            (fields.Integer, pa.int64()),
+            (fields.Number, pa.float64()),
+            # Date is a subclass of DateTime, so it comes first.
+            (fields.Date, pa.date32()),
+            (fields.Time, pa.time64('us')),
+            (fields.DateTime, pa.timestamp('us')),
+        ]:
+            if isinstance(field_obj, field_class):
+                return arrow_type, None
+
+        raise TypeError(f'No Arrow type for {type(field_obj).__name__} fields.')
+
+    def to_table(self, records):
+        pa = self._pa
+        arrays = []
+
+        for key, arrow_type, dictionary in self._columns:
+            values = [record.get(key) for record in records]
+
+            if dictionary is None:
+                arrays.append(pa.array(values, type=arrow_type))
+                continue
+
+            choices, index = dictionary
+
+            try:
+                indices = [
+                    None if value is None else index[value.casefold()]
+                    for value in values
+                ]
+            except KeyError as error:
+                raise ValueError(
+                    f'{error.args[0]!r} is not an allowed value for {key}.'
+                ) from None
+
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(indices, type=arrow_type.index_type), choices
+            ))
+
+        return pa.Table.from_arrays(arrays, schema=self.arrow_schema)
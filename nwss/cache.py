@@ -0,0 +1,218 @@
+'''
+Cache the results of validating rows, so unchanged rows skip validation.
+
+Pass a backend to WaterSampleSchema(cache=...) and iter_load, load_rows and
+the tools built on them look each row up before loading it. Rows are keyed
+by a hash of their normalized content, the CDC version and the package
+version, so a new release of the package never reuses old results.
+
+Rows are stored as JSON, with dates and times in ISO format that are
+parsed again on the way out, so reading a cache file never runs code from
+it.
+
+Only valid rows are cached. Whether a date is too far in the future depends
+on the day a row is checked, so the dates of a cached row are checked again
+against the schema's latest_date, and a row that no longer passes is
+validated in full.
+'''
+import collections
+import datetime
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+
+from marshmallow import fields
+from marshmallow.utils import is_collection
+
+
+class MemoryCache():
+    '''
+    In-memory backend that keeps the maxsize most recently used rows.
+    '''
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache():
+    '''
+    On-disk backend in a sqlite database at path. Writes are committed every
+    commit_every rows and on close, so use it as a context manager or call
+    close when done. Like MemoryCache, it can be shared by threads: its one
+    connection is used by one thread at a time.
+    '''
+
+    def __init__(self, path, commit_every=1000):
+        self.commit_every = commit_every
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS rows '
+            '(key BLOB PRIMARY KEY, value BLOB NOT NULL) WITHOUT ROWID'
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            found = self._connection.execute(
+                'SELECT value FROM rows WHERE key = ?', (key,)
+            ).fetchone()
+
+        return found[0] if found else None
+
+    def set(self, key, value):
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO rows (key, value) VALUES (?, ?)', (key, value)
+            )
+            self._pending += 1
+
+            if self._pending >= self.commit_every:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._connection.commit()
+        self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT count(*) FROM rows').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@functools.lru_cache(maxsize=None)
+def _release_key():
+    # Imported here, as nwss imports the schemas, which import this module.
+    from nwss import CDC_VERSION, __version__
+
+    return f'{CDC_VERSION}:{__version__}'
+
+
+class RowCache():
+    '''
+    Reads and writes a schema's results in a backend. iter_load builds one
+    for each call; there is no need to use it directly.
+    '''
+
+    def __init__(self, schema, backend):
+        self.schema = schema
+        self.backend = backend
+
+        # 'json' is the format of cached values. The fields loaded and
+        # which of them may be missing decide whether a row is valid.
+        partial = schema.partial
+
+        options = [
+            _release_key(),
+            'json',
+            schema.canonicalize,
+            schema.unknown,
+            sorted(partial) if is_collection(partial) else bool(partial),
+            sorted(schema.load_fields),
+        ]
+        self._prefix = json.dumps(options).encode('utf-8')
+
+        self._attributes = set()
+        self._date_fields = []
+        self._parsers = {}
+
+        for name, field_obj in schema.load_fields.items():
+            attribute = field_obj.attribute or name
+            self._attributes.add(attribute)
+
+            if isinstance(field_obj, fields.Date):
+                self._date_fields.append(attribute)
+                self._parsers[attribute] = datetime.date.fromisoformat
+            elif isinstance(field_obj, fields.Time):
+                self._parsers[attribute] = datetime.time.fromisoformat
+
+    def key(self, row):
+        '''
+        Return the cache key of an input row. Empty strings and None are
+        the same, as they are when the row is loaded.
+        '''
+        normalized = {k: None if v == '' else v for k, v in row.items()}
+        content = json.dumps(normalized, sort_keys=True, default=str)
+
+        digest = hashlib.blake2b(self._prefix, digest_size=16)
+        digest.update(content.encode('utf-8'))
+
+        return digest.digest()
+
+    def get(self, key):
+        '''
+        Return the loaded data cached under key, or None if there is none
+        or its dates are now past the schema's latest_date.
+        '''
+        value = self.backend.get(key)
+
+        if value is None:
+            return None
+
+        data = json.loads(value)
+
+        for name, parse in self._parsers.items():
+            if data.get(name) is not None:
+                data[name] = parse(data[name])
+
+        latest = self.schema.latest_date()
+
+        for name in self._date_fields:
+            date = data.get(name)
+
+            if date is not None and date > latest:
+                return None
+
+        return data
+
+    def set(self, key, data):
+        # Fields kept with unknown=INCLUDE could hold anything, so rows
+        # with them are not cached.
+        if not self._attributes.issuperset(data):
+            return
+
+        self.backend.set(key, json.dumps(data, default=_isoformat))
+
+
+def _isoformat(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
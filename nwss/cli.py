@@ -0,0 +1,246 @@
+'''
+The nwss command. Run nwss validate --help for usage.
+'''
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import json
+import sys
+
+from nwss.errors import RowError, flatten_errors
+from nwss.schemas import WaterSampleSchema
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_input(path):
+    '''
+    Open a CSV file, or stdin for '-', as text. Gzipped input is detected
+    from its first bytes and decompressed as it is read.
+    '''
+    # utf-8-sig drops the byte order mark Excel adds to CSV exports.
+    encoding = 'utf-8-sig'
+
+    if path == '-':
+        stream = io.BufferedReader(sys.stdin.buffer)
+
+        if stream.peek(2)[:2] == GZIP_MAGIC:
+            stream = gzip.GzipFile(fileobj=stream)
+
+        return io.TextIOWrapper(stream, encoding=encoding, newline='')
+
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == GZIP_MAGIC
+
+    if compressed:
+        return gzip.open(path, 'rt', encoding=encoding, newline='')
+
+    return open(path, encoding=encoding, newline='')
+
+
+def open_output(path):
+    '''
+    Open a file, or stdout for '-', for writing text. Paths ending in .gz
+    are gzipped.
+    '''
+    if path == '-':
+        return contextlib.nullcontext(sys.stdout)
+
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', newline='')
+
+    return open(path, 'w', newline='')
+
+
+class CSVWriter():
+    def __init__(self, f, fieldnames):
+        self.f = f
+        self._writer = csv.DictWriter(f, fieldnames, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+
+class JSONLinesWriter():
+    def __init__(self, f, fieldnames):
+        self.f = f
+
+    def write(self, row):
+        self.f.write(json.dumps(row))
+        self.f.write('\n')
+
+
+WRITERS = {
+    'csv': CSVWriter,
+    'jsonl': JSONLinesWriter,
+}
+
+
+def positive_int(value):
+    '''
+    argparse type for options that must be a whole number above zero.
+    '''
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be a positive integer, not {value!r}')
+
+    return number
+
+
+def validate(args):
+    '''
+    Validate a file, writing valid rows and errors as they are found.
+    Returns the exit status: 0 if every row is valid, otherwise 1.
+    '''
+    schema = WaterSampleSchema(normalize_in_place=True, batch_size=args.chunk_size)
+    Writer = WRITERS[args.format]
+
+    with contextlib.ExitStack() as stack:
+        if args.input.lower().endswith('.xlsx'):
+            from nwss.xlsx import iter_rows
+
+            rows = iter_rows(args.input, sheet=args.sheet, schema=schema)
+        else:
+            rows = csv.DictReader(stack.enter_context(open_input(args.input)))
+
+        errors_file = stack.enter_context(open_output(args.errors))
+        error_writer = Writer(errors_file, RowError._fields)
+
+        if args.valid:
+            valid_file = stack.enter_context(open_output(args.valid))
+            valid_writer = Writer(valid_file, list(schema.dump_fields))
+        else:
+            valid_file = valid_writer = None
+
+        if args.workers > 1:
+            from nwss.parallel import iter_load_parallel
+
+            results = iter_load_parallel(
+                rows,
+                chunk_size=args.chunk_size,
+                max_workers=args.workers,
+                threads=args.threads
+            )
+        else:
+            results = schema.iter_load(rows)
+
+        results = stack.enter_context(contextlib.closing(results))
+
+        n_rows = n_invalid = n_errors = 0
+
+        for index, data, errors in results:
+            n_rows += 1
+
+            if errors:
+                n_invalid += 1
+
+                for error in flatten_errors(index, errors):
+                    if n_errors == args.max_errors:
+                        break
+
+                    error_writer.write(error._asdict())
+                    n_errors += 1
+
+            elif valid_writer:
+                valid_writer.write(schema.dump(data))
+
+            if n_rows % args.chunk_size == 0:
+                errors_file.flush()
+
+                if valid_file:
+                    valid_file.flush()
+
+            if n_errors == args.max_errors:
+                print(f'Stopped after {n_errors} errors.', file=sys.stderr)
+                break
+
+    print(
+        f'{n_rows} rows: {n_rows - n_invalid} valid, {n_invalid} with errors.',
+        file=sys.stderr
+    )
+
+    return 1 if n_invalid else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='nwss',
+        description='Tools for the NWSS data standard.'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    validate_parser = subparsers.add_parser(
+        'validate',
+        help='Validate a CSV or Excel file of NWSS samples.',
+        description='Stream a CSV file, plain or gzipped, or a sheet of an '
+                    '.xlsx workbook through WaterSampleSchema. Errors are '
+                    'written one per row and field. Exits with status 1 if '
+                    'any row is invalid.'
+    )
+    validate_parser.add_argument(
+        'input',
+        help="CSV or .xlsx file to validate, or '-' for CSV on stdin."
+    )
+    validate_parser.add_argument(
+        '--sheet',
+        help='Sheet of an .xlsx file to validate (default: the first).'
+    )
+    validate_parser.add_argument(
+        '--valid',
+        metavar='PATH',
+        help='Write valid rows, as loaded, to PATH. Not written by default.'
+    )
+    validate_parser.add_argument(
+        '--errors',
+        metavar='PATH',
+        default='-',
+        help="Write errors to PATH (default: '-', stdout)."
+    )
+    validate_parser.add_argument(
+        '--format',
+        choices=sorted(WRITERS),
+        default='jsonl',
+        help='Format of both outputs (default: jsonl). '
+             'Outputs ending in .gz are gzipped.'
+    )
+    validate_parser.add_argument(
+        '--chunk-size',
+        type=positive_int,
+        default=1000,
+        help='Rows per chunk sent to workers and written between flushes '
+             '(default: 1000).'
+    )
+    validate_parser.add_argument(
+        '--workers',
+        type=positive_int,
+        default=1,
+        help='Number of processes to validate with (default: 1).'
+    )
+    validate_parser.add_argument(
+        '--threads',
+        action='store_true',
+        help='Validate with --workers threads instead of processes.'
+    )
+    validate_parser.add_argument(
+        '--max-errors',
+        type=positive_int,
+        metavar='N',
+        help='Stop after N errors.'
+    )
+    validate_parser.set_defaults(run=validate)
+
+    args = parser.parse_args(argv)
+
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
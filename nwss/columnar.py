@@ -0,0 +1,531 @@
+'''
+Validate columns of NWSS data with NumPy instead of row by row.
+
+validate_columns takes a mapping of column name to 1-D array, such as a dict
+of NumPy arrays, a pandas DataFrame or a pyarrow Table, and runs the
+WaterSampleSchema checks over whole columns: null checks, Range, Length,
+Regexp and categorical checks as array operations, and the schema-level
+rules as boolean masks over rows.
+
+The masks only pick out cells and rows that might fail. Each one is then
+checked again with the schema's own field or validator, which also supplies
+the error message, so the result agrees with WaterSampleSchema.iter_load.
+Typed columns (floats, integers, datetime64) skip per-value parsing
+entirely; string columns that hold numbers or dates are parsed value by
+value with the field's deserializer. In float columns, NaN is read as an
+empty cell, following pandas and Arrow.
+'''
+import numpy as np
+from marshmallow import RAISE, ValidationError, fields, missing, validate
+from marshmallow.decorators import VALIDATES, VALIDATES_SCHEMA
+from marshmallow.exceptions import SCHEMA
+
+from nwss import fields as nwss_fields, rules, validators as nwss_validators
+from nwss.errors import ErrorReport
+from nwss.schemas import WaterSampleSchema
+from nwss.utils import get_future_date, schema_hooks
+
+
+class Column():
+    '''
+    Loaded values of one field. values holds deserialized Python objects,
+    and numbers holds float64 (numeric fields) or datetime64[D] (date
+    fields) for array comparisons.
+    '''
+
+    def __init__(self, values, null, failed, numbers=None):
+        self.values = values
+        self.null = null
+        self.failed = failed
+        self.numbers = numbers
+
+    @property
+    def present(self):
+        return ~self.null & ~self.failed
+
+    def truthy(self):
+        '''
+        Mask of cells that are truthy in Python, like data.get(key) in the
+        schema-level checks.
+        '''
+        if self.numbers is not None and self.numbers.dtype.kind == 'f':
+            return self.present & (np.nan_to_num(self.numbers) != 0)
+
+        return self.present
+
+
+class ColumnarResult():
+    '''
+    Per-row, per-field error matrix. codes[row, column] is 0 for a valid
+    cell, or k for messages[k - 1]. Columns are the schema's fields, any
+    unknown input columns, then one column per schema-level rule.
+    '''
+
+    def __init__(self, n_rows, columns, rules):
+        self.columns = list(columns) + list(rules)
+        self.rules = list(rules)
+        self.messages = []
+        self.values = {}
+        self.codes = np.zeros((n_rows, len(self.columns)), dtype=np.uint16)
+
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+        self._message_index = {}
+
+    def add(self, rows, column, message):
+        try:
+            code = self._message_index[message]
+        except KeyError:
+            self.messages.append(message)
+            code = self._message_index[message] = len(self.messages)
+
+        self.codes[rows, self._column_index[column]] = code
+
+    @property
+    def valid(self):
+        '''Boolean mask of rows without errors.'''
+        return ~self.codes.any(axis=1)
+
+    def to_messages(self):
+        '''
+        Return errors in the shape of ValidationError.messages for a
+        many=True load: {row: {field: [message, ...]}}. Rule errors are
+        listed under '_schema'.
+        '''
+        rule_columns = set(self.rules)
+        errors = {}
+
+        for row, column in zip(*np.nonzero(self.codes)):
+            name = self.columns[column]
+            message = self.messages[self.codes[row, column] - 1]
+            key = SCHEMA if name in rule_columns else name
+
+            errors.setdefault(int(row), {}).setdefault(key, []).append(message)
+
+        return errors
+
+    def to_report(self):
+        '''
+        Return errors as an nwss.errors.ErrorReport, in the same order as
+        to_messages.
+        '''
+        rule_columns = set(self.rules)
+        names = [SCHEMA if name in rule_columns else name for name in self.columns]
+        fields = list(dict.fromkeys(names))
+        field_ids = np.array([fields.index(name) for name in names], dtype=np.int64)
+
+        rows, columns = np.nonzero(self.codes)
+
+        return ErrorReport.from_dict({
+            'fields': fields,
+            'messages': self.messages,
+            'rows': rows.tolist(),
+            'field_ids': field_ids[columns].tolist(),
+            'message_ids': (self.codes[rows, columns].astype(np.int64) - 1).tolist(),
+        })
+
+
+def validate_columns(columns, schema=None):
+    '''
+    Validate a mapping of column name to array with WaterSampleSchema, or
+    the given schema instance, and return a ColumnarResult.
+    '''
+    schema = schema or WaterSampleSchema()
+
+    if isinstance(schema, WaterSampleSchema):
+        # Check every row's dates against one latest_date.
+        with schema._batch_clock():
+            return _validate_columns(columns, schema)
+
+    return _validate_columns(columns, schema)
+
+
+def _validate_columns(columns, schema):
+    if hasattr(columns, 'column_names'):
+        names = list(columns.column_names)
+    else:
+        names = list(columns.keys())
+
+    arrays = {name: _to_array(columns[name]) for name in names}
+    lengths = {len(array) for array in arrays.values()}
+
+    if len(lengths) > 1:
+        raise ValueError('All columns must have the same length.')
+
+    n_rows = lengths.pop() if lengths else 0
+
+    field_keys = {
+        (field_obj.data_key or attr_name): attr_name
+        for attr_name, field_obj in schema.load_fields.items()
+    }
+    unknown = [name for name in names if name not in field_keys]
+    rule_names = [
+        attr_name for attr_name, _, _ in schema_hooks(schema, VALIDATES_SCHEMA)
+    ]
+
+    result = ColumnarResult(n_rows, list(field_keys) + unknown, rule_names)
+    loaded = {}
+
+    for data_key, attr_name in field_keys.items():
+        field_obj = schema.load_fields[attr_name]
+        column = _load_column(
+            field_obj, data_key, arrays.get(data_key), n_rows, result
+        )
+
+        if column is not None:
+            loaded[field_obj.attribute or attr_name] = column
+
+    if schema.unknown == RAISE:
+        message = schema.error_messages['unknown']
+
+        for name in unknown:
+            result.add(slice(None), name, message)
+
+    _run_field_validators(schema, loaded, result)
+
+    # Schema-level rules only run for rows without field errors, as they
+    # do when each row is loaded on its own.
+    ok = result.valid.copy()
+    masks = _rule_masks(loaded, n_rows, schema)
+
+    for attr_name in rule_names:
+        candidates = ok & masks.get(attr_name, True)
+        validator = getattr(schema, attr_name)
+
+        for row in np.flatnonzero(candidates):
+            try:
+                validator(_row(loaded, row), partial=None, many=False)
+            except ValidationError as e:
+                for message in e.messages:
+                    result.add(row, attr_name, message)
+
+    result.values = {key: column.values for key, column in loaded.items()}
+
+    return result
+
+
+def _to_array(values):
+    if hasattr(values, 'to_numpy') and not isinstance(values, np.ndarray):
+        try:
+            values = values.to_numpy(zero_copy_only=False)
+        except TypeError:
+            values = values.to_numpy()
+
+    return np.asarray(values)
+
+
+def _null_mask(array):
+    kind = array.dtype.kind
+
+    if kind == 'f':
+        return np.isnan(array)
+
+    if kind in 'mM':
+        return np.isnat(array)
+
+    if kind in 'US':
+        return array == array.dtype.type()
+
+    if kind == 'O':
+        return (
+            np.equal(array, None) |
+            np.equal(array, '') |
+            np.not_equal(array, array)
+        )
+
+    return np.zeros(len(array), dtype=bool)
+
+
+_is_str = np.frompyfunc(lambda value: isinstance(value, str), 1, 1)
+
+
+def _load_column(field_obj, data_key, array, n_rows, result):
+    '''
+    Deserialize and validate one column, recording errors in result.
+    Returns a Column, or None if the column is missing and has no default.
+    '''
+    if array is None:
+        if field_obj.required:
+            message = field_obj.make_error('required').messages[0]
+            result.add(slice(None), data_key, message)
+            return None
+
+        try:
+            default = field_obj.load_default
+        except AttributeError:
+            # load_default was called missing before marshmallow 3.13.
+            default = field_obj.missing
+
+        if default is missing:
+            return None
+
+        values = np.full(n_rows, default() if callable(default) else default)
+        null = np.ones(n_rows, dtype=bool)
+        return Column(values.astype(object), null, ~null)
+
+    null = _null_mask(array)
+    failed = np.zeros(n_rows, dtype=bool)
+    values = np.empty(n_rows, dtype=object)
+    numbers = None
+    kind = array.dtype.kind
+
+    if isinstance(field_obj, fields.Number) and kind in 'fiu':
+        numbers = array.astype(np.float64)
+        failed |= ~null & ~np.isfinite(numbers)
+
+        if isinstance(field_obj, fields.Integer):
+            values[:] = np.nan_to_num(numbers).astype(np.int64).tolist()
+        else:
+            values[:] = numbers.tolist()
+
+    elif isinstance(field_obj, fields.Date) and kind == 'M':
+        numbers = array.astype('datetime64[D]')
+        values[:] = numbers.astype(object).tolist()
+
+    elif isinstance(field_obj, fields.String) and kind in 'OU':
+        values[:] = array
+        failed |= ~null & ~_is_str(array).astype(bool)
+
+        if isinstance(field_obj, nwss_fields.ListString):
+            _deserialize_each(field_obj, data_key, array, ~null & ~failed, values, failed)
+
+    else:
+        _deserialize_each(field_obj, data_key, array, ~null, values, failed)
+
+        if isinstance(field_obj, fields.Number):
+            numbers = np.full(n_rows, np.nan)
+            ok = ~null & ~failed
+            numbers[ok] = values[ok].astype(np.float64)
+        elif isinstance(field_obj, fields.Date):
+            numbers = np.full(n_rows, np.datetime64('NaT'), dtype='datetime64[D]')
+            ok = ~null & ~failed
+            numbers[ok] = values[ok].astype('datetime64[D]')
+
+    column = Column(values, null, failed, numbers)
+
+    for validator in field_obj.validators:
+        failed |= _validate(validator, field_obj, column)
+
+    if isinstance(field_obj, nwss_fields.CategoricalString) and field_obj.canonicalize:
+        ok = column.present
+        values[ok] = _map_unique(field_obj.allowed_values.canonical, values[ok])
+
+    values[null] = None
+
+    if not field_obj.allow_none and null.any():
+        message = field_obj.make_error('null').messages[0]
+        result.add(null, data_key, message)
+
+    # Confirm each candidate failure with the field itself, which also
+    # gives the exact message.
+    for row in np.flatnonzero(failed):
+        try:
+            values[row] = field_obj.deserialize(array[row], data_key)
+        except ValidationError as e:
+            values[row] = None
+            for message in e.messages:
+                result.add(row, data_key, message)
+        else:
+            failed[row] = False
+
+    return column
+
+
+def _deserialize_each(field_obj, data_key, array, mask, values, failed):
+    for row in np.flatnonzero(mask):
+        try:
+            values[row] = field_obj._deserialize(array[row], data_key, None)
+        except ValidationError:
+            failed[row] = True
+
+
+def _map_unique(function, values):
+    '''
+    Apply function once per distinct value, which for categorical columns
+    is a handful of calls however many rows there are.
+    '''
+    if not len(values):
+        return values
+
+    unique, inverse = np.unique(values.astype(str), return_inverse=True)
+    mapped = np.array([function(value) for value in unique], dtype=object)
+
+    return mapped[inverse]
+
+
+def _validate(validator, field_obj, column):
+    '''
+    Return a mask of cells that may fail validator.
+    '''
+    ok = column.present
+    candidates = np.zeros(len(ok), dtype=bool)
+
+    if not ok.any():
+        return candidates
+
+    values = column.values[ok]
+
+    if isinstance(validator, nwss_validators.CaseInsensitiveOneOf):
+        allowed = _map_unique(
+            lambda value: value.casefold() in validator.canonical_choices, values
+        )
+        candidates[ok] = ~allowed.astype(bool)
+
+    elif isinstance(validator, validate.Range) and column.numbers is not None:
+        numbers = column.numbers[ok]
+        bad = np.zeros(len(numbers), dtype=bool)
+
+        if validator.min is not None:
+            bad |= numbers < validator.min if validator.min_inclusive \
+                else numbers <= validator.min
+
+        if validator.max is not None:
+            bad |= numbers > validator.max if validator.max_inclusive \
+                else numbers >= validator.max
+
+        candidates[ok] = bad
+
+    elif isinstance(validator, validate.Length):
+        lengths = np.frompyfunc(len, 1, 1)(values).astype(np.int64)
+        bad = np.zeros(len(lengths), dtype=bool)
+
+        if validator.equal is not None:
+            bad |= lengths != validator.equal
+        else:
+            if validator.min is not None:
+                bad |= lengths < validator.min
+            if validator.max is not None:
+                bad |= lengths > validator.max
+
+        candidates[ok] = bad
+
+    elif isinstance(validator, validate.Regexp):
+        matches = np.frompyfunc(validator.regex.match, 1, 1)(values)
+        candidates[ok] = np.equal(matches, None)
+
+    else:
+        candidates[ok] = True
+
+    return candidates
+
+
+def _latest_date(schema):
+    if isinstance(schema, WaterSampleSchema):
+        return np.datetime64(schema.latest_date(), 'D')
+
+    return np.datetime64(get_future_date(24), 'D')
+
+
+def _run_field_validators(schema, loaded, result):
+    '''
+    Run @validates methods, using a vectorized mask where one is known.
+    '''
+    tomorrow = _latest_date(schema)
+
+    for attr_name, _, kwargs in schema_hooks(schema, VALIDATES):
+        field_name = kwargs['field_name']
+        field_obj = schema.fields[field_name]
+        column = loaded.get(field_obj.attribute or field_name)
+
+        if column is None:
+            continue
+
+        candidates = column.present
+
+        if column.numbers is not None and column.numbers.dtype.kind == 'M':
+            candidates = candidates & (column.numbers > tomorrow)
+
+        validator = getattr(schema, attr_name)
+        data_key = field_obj.data_key or field_name
+
+        for row in np.flatnonzero(candidates):
+            try:
+                validator(column.values[row])
+            except ValidationError as e:
+                for message in e.messages:
+                    result.add(row, data_key, message)
+
+
+def _row(loaded, row):
+    return {
+        key: column.values[row]
+        for key, column in loaded.items()
+        if not column.failed[row]
+    }
+
+
+def _rule_masks(loaded, n_rows, schema):
+    '''
+    Boolean masks of rows that may fail each schema-level rule. Masks for
+    ConditionalRequirements are built from their conditions; rules without
+    a mask are checked on every row.
+    '''
+    def column(key):
+        try:
+            return loaded[key]
+        except KeyError:
+            none = np.ones(n_rows, dtype=bool)
+            return Column(np.full(n_rows, None, dtype=object), none, ~none)
+
+    def holds(condition):
+        return _condition_mask(condition, column(condition.field))
+
+    masks = {
+        attr_name:
+            np.logical_or.reduce([holds(c) for c in rule.when]) &
+            ~np.logical_and.reduce([holds(c) for c in rule.then])
+        for attr_name, rule in rules.schema_rules(schema)
+    }
+
+    if not isinstance(schema, WaterSampleSchema):
+        return masks
+
+    def dates(key):
+        numbers = column(key).numbers
+        if numbers is None:
+            return np.full(n_rows, np.datetime64('NaT'), dtype='datetime64[D]')
+        return numbers
+
+    def empty(key):
+        return ~column(key).truthy()
+
+    tomorrow = _latest_date(schema)
+    result_date = dates('test_result_date')
+    collect_date = dates('sample_collect_date')
+
+    masks.update({
+        'validate_county_jurisdiction':
+            empty('county_names') & empty('other_jurisdiction'),
+        'validate_test_result_date':
+            (result_date > tomorrow) | (collect_date > result_date),
+    })
+
+    return masks
+
+
+def _condition_mask(condition, column):
+    '''
+    Mask of rows where a rules condition holds.
+    '''
+    if isinstance(condition, rules.Present):
+        return column.truthy()
+
+    # Empty cells are None in the rows the rules see.
+    mask = np.full(len(column.null), condition.holds({}), dtype=bool)
+    present = column.present
+
+    if isinstance(condition, rules.NotEqual):
+        values = column.values if column.numbers is None else column.numbers
+        mask[present] = np.not_equal(values[present], condition.value)
+    elif isinstance(condition, rules.OneOf):
+        mask[present] = _map_unique(
+            lambda value: condition.holds({condition.field: value}),
+            column.values[present]
+        ).astype(bool)
+    else:
+        # Unknown conditions are checked row by row.
+        mask[present] = [
+            condition.holds({condition.field: value})
+            for value in column.values[present]
+        ]
+
+    return mask
@@ -0,0 +1,355 @@
+'''
+Compile a marshmallow schema into a single specialized load function.
+
+Schema.load looks up every field, builds a getter closure and routes each
+result through an error store, for every value it loads. compile_schema
+does that work once: it generates the source of one function that loads a
+row with each field's deserializer and validators inlined, then runs the
+schema's hooks around it exactly as marshmallow would. Results and error
+messages are the same as schema.load.
+'''
+from collections.abc import Mapping
+from contextlib import nullcontext
+
+from marshmallow import EXCLUDE, INCLUDE, RAISE, ValidationError, missing
+from marshmallow.decorators import PRE_LOAD, POST_LOAD, VALIDATES, VALIDATES_SCHEMA
+from marshmallow.error_store import ErrorStore
+from marshmallow.exceptions import SCHEMA
+from marshmallow.fields import Field
+from marshmallow.utils import is_collection
+from marshmallow.validate import Validator
+
+from nwss.utils import schema_hooks
+
+
+class CompiledSchema():
+    '''
+    Fast equivalent of a schema's load method. Build it with compile_schema.
+    '''
+
+    def __init__(self, schema, load_row, source):
+        self.schema = schema
+        self.source = source
+        self._load_row = load_row
+        # WaterSampleSchema reads today's date once per load; other schemas
+        # have no clock to hold.
+        self._batch_clock = getattr(schema, '_batch_clock', nullcontext)
+
+        self._pre_load = [
+            (getattr(schema, attr_name), hook_many, kwargs.get('pass_original', False))
+            for attr_name, hook_many, kwargs in schema_hooks(schema, PRE_LOAD)
+        ]
+
+        self._schema_validators = [
+            (getattr(schema, attr_name), hook_many, kwargs)
+            for attr_name, hook_many, kwargs in schema_hooks(schema, VALIDATES_SCHEMA)
+        ]
+
+    def load(self, data, many=None):
+        with self._batch_clock():
+            return self._load(data, many)
+
+    def _load(self, data, many):
+        schema = self.schema
+        many = schema.many if many is None else bool(many)
+        partial = schema.partial
+
+        try:
+            processed_data = self._invoke_pre_load(data, many, partial)
+        except ValidationError as err:
+            errors = err.normalized_messages()
+            result = None
+        else:
+            errors = {}
+
+            if many:
+                if not is_collection(processed_data):
+                    errors[SCHEMA] = [schema.error_messages['type']]
+                    result = []
+                else:
+                    result = []
+
+                    for index, item in enumerate(processed_data):
+                        row, row_errors = self._load_row(item)
+                        result.append(row)
+
+                        if row_errors:
+                            errors[index] = row_errors
+            else:
+                result, errors = self._load_row(processed_data)
+
+            if self._schema_validators:
+                errors = self._invoke_schema_validators(
+                    errors, result, data, many, partial
+                )
+
+        if errors:
+            exc = ValidationError(errors, data=data, valid_data=result)
+            schema.handle_error(exc, data, many=many, partial=partial)
+            raise exc
+
+        return result
+
+    def _invoke_pre_load(self, data, many, partial):
+        original_data = data
+
+        for pass_many in (True, False):
+            for processor, hook_many, pass_original in self._pre_load:
+                if hook_many != pass_many:
+                    continue
+
+                if many and not pass_many:
+                    if pass_original:
+                        data = [
+                            processor(item, original, many=many, partial=partial)
+                            for item, original in zip(data, original_data)
+                        ]
+                    else:
+                        data = [
+                            processor(item, many=many, partial=partial)
+                            for item in data
+                        ]
+                elif pass_original:
+                    data = processor(data, original_data, many=many, partial=partial)
+                else:
+                    data = processor(data, many=many, partial=partial)
+
+        return data
+
+    def _invoke_schema_validators(self, errors, result, original_data, many, partial):
+        error_store = ErrorStore()
+        error_store.errors = errors
+        field_errors = bool(errors)
+
+        for pass_many in (True, False):
+            for validator, hook_many, kwargs in self._schema_validators:
+                if hook_many != pass_many:
+                    continue
+
+                if field_errors and kwargs['skip_on_field_errors']:
+                    continue
+
+                pass_original = kwargs.get('pass_original', False)
+
+                if many and not pass_many:
+                    for index, (item, original) in enumerate(zip(result, original_data)):
+                        self._run_validator(
+                            validator, item, original, error_store,
+                            many, partial, pass_original, index
+                        )
+                else:
+                    self._run_validator(
+                        validator, result, original_data, error_store,
+                        many, partial, pass_original, None
+                    )
+
+        return error_store.errors
+
+    def _run_validator(self, validator, output, original, error_store,
+                       many, partial, pass_original, index):
+        try:
+            if pass_original:
+                validator(output, original, partial=partial, many=many)
+            else:
+                validator(output, partial=partial, many=many)
+        except ValidationError as err:
+            field_name = err.field_name
+            data_key = field_name
+
+            if field_name != SCHEMA:
+                schema = self.schema
+                field_obj = schema.fields.get(field_name) or \
+                    schema.declared_fields.get(field_name)
+
+                if field_obj and field_obj.data_key is not None:
+                    data_key = field_obj.data_key
+
+            error_store.store_error(err.messages, data_key, index=index)
+
+
+def _check_supported(schema):
+    if schema.partial:
+        raise ValueError('Cannot compile a schema that loads partial data.')
+
+    if not schema.opts.index_errors:
+        raise ValueError('Cannot compile a schema with index_errors disabled.')
+
+    if schema_hooks(schema, POST_LOAD):
+        raise ValueError('Cannot compile a schema with post_load hooks.')
+
+    if any(hook_many for _, hook_many, _ in schema_hooks(schema, VALIDATES)):
+        raise ValueError('Cannot compile a schema with pass_many field validators.')
+
+    for attr_name, field_obj in schema.load_fields.items():
+        if '.' in (field_obj.attribute or attr_name):
+            raise ValueError(f'Cannot compile dotted attribute for {attr_name!r}.')
+
+        # The compiled load calls _deserialize directly, so it would skip
+        # a deserialize set on the instance, e.g. by nwss.profiling.
+        if 'deserialize' in vars(field_obj):
+            raise ValueError(
+                f'Cannot compile {attr_name!r}, its deserialize method is '
+                'replaced, e.g. by a Profile.'
+            )
+
+
+def compile_schema(schema):
+    '''
+    Generate a CompiledSchema for a schema instance. Raises ValueError if
+    the schema uses a marshmallow feature the compiler does not handle.
+    '''
+    _check_supported(schema)
+
+    namespace = {
+        '_missing': missing,
+        '_ValidationError': ValidationError,
+        '_Mapping': Mapping,
+        '_dict': schema.dict_class,
+        '_type_error': schema.error_messages['type'],
+        '_unknown_error': schema.error_messages['unknown'],
+    }
+
+    lines = [
+        'def load_row(data):',
+        '    result = _dict()',
+        '    errors = {}',
+        '    if not isinstance(data, _Mapping):',
+        f'        errors[{SCHEMA!r}] = [_type_error]',
+        '        return result, errors',
+    ]
+
+    known_keys = set()
+
+    for i, (attr_name, field_obj) in enumerate(schema.load_fields.items()):
+        data_key = field_obj.data_key if field_obj.data_key is not None else attr_name
+        result_key = field_obj.attribute or attr_name
+        known_keys.add(data_key)
+
+        namespace[f'_f{i}'] = field_obj
+        lines += _compile_field(i, field_obj, data_key, result_key, namespace)
+
+    for i, (attr_name, _, kwargs) in enumerate(schema_hooks(schema, VALIDATES)):
+        field_name = kwargs['field_name']
+
+        try:
+            field_obj = schema.fields[field_name]
+        except KeyError:
+            if field_name in schema.declared_fields:
+                continue
+            raise ValueError(f'"{field_name}" field does not exist.')
+
+        data_key = field_obj.data_key if field_obj.data_key is not None else field_name
+        result_key = field_obj.attribute or field_name
+        namespace[f'_fv{i}'] = getattr(schema, attr_name)
+
+        lines += [
+            f'    if {result_key!r} in result:',
+            '        try:',
+            f'            if _fv{i}(result[{result_key!r}]) is _missing:',
+            f'                del result[{result_key!r}]',
+            '        except _ValidationError as error:',
+            f'            errors[{data_key!r}] = error.messages',
+            '            if not error.valid_data:',
+            f'                del result[{result_key!r}]',
+        ]
+
+    unknown = schema.unknown
+
+    if unknown != EXCLUDE:
+        namespace['_known_keys'] = frozenset(known_keys)
+
+        lines += [
+            '    for key in data:',
+            '        if key not in _known_keys:',
+        ]
+
+        if unknown == INCLUDE:
+            lines.append('            result[key] = data[key]')
+        elif unknown == RAISE:
+            lines.append('            errors[key] = [_unknown_error]')
+
+    lines.append('    return result, errors')
+
+    source = '\n'.join(lines) + '\n'
+    exec(compile(source, f'<compiled {type(schema).__name__}>', 'exec'), namespace)
+
+    return CompiledSchema(schema, namespace['load_row'], source)
+
+
+def _store_error(indent, data_key, result_key):
+    '''
+    Return source lines that record a field error the way Schema.load does,
+    keeping any valid_data the error carries.
+    '''
+    return [
+        f'{indent}errors[{data_key!r}] = error.messages',
+        f'{indent}if error.valid_data:',
+        f'{indent}    result[{result_key!r}] = error.valid_data',
+    ]
+
+
+def _compile_field(i, field_obj, data_key, result_key, namespace):
+    '''
+    Return source lines that load one field, following Field.deserialize.
+    '''
+    lines = [f'    value = data.get({data_key!r}, _missing)']
+
+    if type(field_obj).deserialize is not Field.deserialize:
+        # The field has its own deserialize, so call it for every value.
+        return lines + [
+            '    try:',
+            f'        value = _f{i}.deserialize(value, {data_key!r}, data)',
+            '    except _ValidationError as error:',
+            *_store_error('        ', data_key, result_key),
+            '    else:',
+            '        if value is not _missing:',
+            f'            result[{result_key!r}] = value',
+        ]
+
+    namespace[f'_d{i}'] = field_obj._deserialize
+
+    # Missing values fall back to Field.deserialize, which handles
+    # required fields and load defaults.
+    lines += [
+        '    if value is _missing:',
+        '        try:',
+        f'            value = _f{i}.deserialize(value, {data_key!r}, data)',
+        '        except _ValidationError as error:',
+        *_store_error('            ', data_key, result_key),
+        '        else:',
+        '            if value is not _missing:',
+        f'                result[{result_key!r}] = value',
+        '    elif value is None:',
+    ]
+
+    if field_obj.allow_none:
+        lines.append(f'        result[{result_key!r}] = None')
+    else:
+        namespace[f'_null{i}'] = field_obj.make_error('null').messages[0]
+        lines.append(f'        errors[{data_key!r}] = [_null{i}]')
+
+    lines += [
+        '    else:',
+        '        try:',
+        f'            value = _d{i}(value, {data_key!r}, data)',
+    ]
+
+    validators = field_obj.validators
+
+    if type(field_obj)._validate is not Field._validate:
+        lines.append(f'            _f{i}._validate(value)')
+    elif len(validators) == 1 and isinstance(validators[0], Validator):
+        namespace[f'_v{i}'] = validators[0]
+        lines.append(f'            _v{i}(value)')
+    elif validators:
+        namespace[f'_v{i}'] = field_obj._validate_all
+        lines.append(f'            _v{i}(value)')
+
+    lines += [
+        '        except _ValidationError as error:',
+        *_store_error('            ', data_key, result_key),
+        '        else:',
+        f'            result[{result_key!r}] = value',
+    ]
+
+    return lines
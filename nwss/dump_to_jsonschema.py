@@ -1,250 +1,194 @@
+import argparse
+import functools
 import json
+import os
 import sys
-from marshmallow_jsonschema import JSONSchema
-from nwss.schemas import WaterSampleSchema
-
-schema = WaterSampleSchema(many=True)
-
-json_schema = JSONSchema()
-
-s = json_schema.dump(schema)
-
-custom_validators = {
-    'allOf': [
-        {
-            'if': {
-                'properties': {
-                    'hum_frac_mic_conc': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                },
-                'required': ['hum_frac_mic_conc']
-            },
-            'then': {
-                'properties': {
-                    'hum_frac_mic_unit': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                    'hum_frac_target_mic': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                    'hum_frac_target_mic_ref': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                },
-                'required': [
-                    'hum_frac_mic_unit',
-                    'hum_frac_target_mic',
-                    'hum_frac_target_mic_ref'
-                ]
-            }
-        },
-        {
-            'if': {
-                'properties': {
-                    'hum_frac_chem_conc': {
-                        'type': ['string'],
-                        'minLength': 1
-                    }
-                },
-                'required': ['hum_frac_chem_conc']
-            },
-            'then': {
-                'properties': {
-                    'hum_frac_chem_unit': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                    'hum_frac_target_chem': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                    'hum_frac_target_chem_ref': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                },
-                'required': [
-                    'hum_frac_chem_unit',
-                    'hum_frac_target_chem',
-                    'hum_frac_target_chem_ref'
-                ]
-            }
-        },
-        {
-            'if': {
-                'properties': {
-                    'other_norm_conc': {
-                        'type': ['string'],
-                        'minLength': 1
-                    }
-                },
-                'required': ['other_norm_conc']
-            },
-            'then': {
-                'properties': {
-                    'other_norm_name': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                    'other_norm_unit': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                    'other_norm_ref': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                },
-                'required': [
-                        'other_norm_name',
-                        'other_norm_unit',
-                        'other_norm_ref'
-                    ]
-            }
-        },
-        {
-            'if': {
-                'properties': {
-                    'sample_location': {'enum': ['upstream']},
-                },
-                'required': ['sample_location'],
-            },
-            'then': {
-                'properties': {
-                    'sample_location_specify': {
-                        'type': ['string'],
-                        'minLength': 1
-                    }
-                },
-                'required': ['sample_location_specify'],
-            },
-        },
-        {
-            'if': {
-                'properties': {
-                    'pretreatment': {'enum': ['yes']},
-                },
-                'required': ['pretreatment'],
-            },
-            'then': {
-                'properties': {
-                    'pretreatment_specify': {
-                        'type': ['string'],
-                        'minLength': 1
-                    }
-                },
-                'required': ['pretreatment_specify'],
-            },
-        },
-        {
-            'if': {
-                'properties': {
-                    'sample_matrix': {
-                        'enum': [
-                            'raw wastewater',
-                            'post grit removal',
-                            'primary effluent',
-                            'secondary effluent',
-                        ]
-                    },
-                },
-                'required': ['sample_matrix'],
-            },
-            'then': {
-                'properties': {
-                    'flow_rate': {'type': ['number']},
-                },
-                'required': ['flow_rate'],
-            },
-        },
-        {
-            'if': {
-                'properties': {'inhibition_detect': {'enum': ['yes']}},
-                'required': ['inhibition_detect'],
-            },
-            'then': {
-                'properties': {
-                    'inhibition_adjust': {
-                        'type': ['string'],
-                        'minLength': 1
-                    },
-                    'inhibition_method': {
-                        'type': ['string'],
-                        'minLength': 1
-                    }
-                },
-                'required': [
-                    'inhibition_adjust',
-                    'inhibition_method'
-                ],
-            }
-        },
-        {
-            'if': {
-                'properties': {
-                    'inhibition_detect': {'enum': ['not tested']}
-                }
-            },
-            'then': {
-                'properties': {'inhibition_method': {'enum': ['none']}}
+
+from nwss import CDC_VERSION, __version__
+
+
+ARTIFACT_PATH = os.path.join(
+    os.path.dirname(__file__), 'data', f'jsonschema-{CDC_VERSION}.json'
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema():
+    """Build the JSON schema for WaterSampleSchema on first use and return
+    the same dict on every later call. Treat the result as read-only.
+    """
+    # Imported here so importing this module stays cheap.
+    from marshmallow_jsonschema import JSONSchema
+    from nwss.rules import schema_rules
+    from nwss.schemas import WaterSampleSchema
+
+    schema = WaterSampleSchema(many=True)
+
+    json_schema = JSONSchema()
+
+    s = json_schema.dump(schema)
+
+    # Get properties so we can mutate it and
+    # ultimately add it back to the schema.
+    properties = s['definitions']['WaterSampleSchema'].pop('properties')
+
+    # Add None to fields that can be empty. These fields
+    # must have null as an enum in the JSON schema.
+    for key, property in properties.items():
+        if property.get('enum'):
+            property.update({
+                'case_insensitive_enums': True
+            })
+
+            if 'null' in property['type']:
+                property['enum'].append(None)
+
+        if property.get('format') == 'time':
+            # Add a regex to validate the time string based on the pattern.
+            hh_mm_ss_regex = '^([0-1]?[0-9]|2[0-3]):[0-5][0-9](:[0-5][0-9])?$'
+            property['pattern'] = hh_mm_ss_regex
+            # Remove the format key so the regex validates instead.
+            property.pop('format')
+
+    # Conditional validation comes from the same rules the
+    # marshmallow schema runs, see nwss.rules.
+    conditional_validators = {
+        'allOf': [
+            rule.to_jsonschema(properties)
+            for _, rule in schema_rules(schema)
+        ]
+    }
+
+    s['definitions']['WaterSampleSchema'].update({
+        'properties': {**properties},
+        **conditional_validators
+    })
+
+    # Reshape the schema so it accepts an array
+    # of the WaterSampleSchema objects.
+    s['definitions'].update({
+        'schema': {
+            'type': 'array',
+            'items': {
+              '$ref': '#/definitions/WaterSampleSchema'
             }
         }
-    ]
-}
-
-# Get properties so we can mutate it and
-# ultimately add it back to the schema.
-properties = s['definitions']['WaterSampleSchema'].pop('properties')
-
-# Add None to fields that can be empty. These fields
-# must have null as an enum in the JSON schema.
-for key, property in properties.items():
-    if property.get('enum'):
-        property.update({
-            'case_insensitive_enums': True
-        })
-
-        if 'null' in property['type']:
-            property['enum'].append(None)
-
-    if property.get('format') == 'time':
-        # Add a regex to validate the time string based on the pattern.
-        hh_mm_ss_regex = '^([0-1]?[0-9]|2[0-3]):[0-5][0-9](:[0-5][0-9])?$'
-        property['pattern'] = hh_mm_ss_regex
-        # Remove the format key so the regex validates instead.
-        property.pop('format')
-
-s['definitions']['WaterSampleSchema'].update({
-    'properties': {**properties},
-    **custom_validators
-})
-
-# Reshape the schema so it accepts an array
-# of the WaterSampleSchema objects.
-s['definitions'].update({
-    'schema': {
-        'type': 'array',
-        'items': {
-          '$ref': '#/definitions/WaterSampleSchema'
-        }
+    })
+
+    # Change the top-level ref to use 'schema',
+    # instead of '#/definitions/WaterSampleSchema'.
+    s.update({
+        '$ref': '#/definitions/schema',
+    })
+
+    return s
+
+
+def write_artifact(path=ARTIFACT_PATH):
+    """Write the JSON schema and the versions it was built for."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    artifact = {
+        'cdc_version': CDC_VERSION,
+        'version': __version__,
+        'schema': get_schema(),
     }
-})
 
-# Change the top-level ref to use 'schema',
-# instead of '#/definitions/WaterSampleSchema'.
-s.update({
-    '$ref': '#/definitions/schema',
-})
+    with open(path, 'w') as f:
+        json.dump(artifact, f, indent=4)
+        f.write('\n')
+
+
+@functools.lru_cache(maxsize=None)
+def load_schema():
+    """Return the JSON schema from the artifact shipped with the package,
+    which is a single file read.
+
+    If the artifact is missing, or was built for another CDC or package
+    version, the schema is built in memory instead. The artifact is never
+    rewritten here, only by --write-artifact.
+    """
+    try:
+        with open(ARTIFACT_PATH) as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        artifact = None
+
+    if artifact and (artifact.get('cdc_version'), artifact.get('version')) == \
+            (CDC_VERSION, __version__):
+        return artifact['schema']
+
+    return get_schema()
+
+
+def _case_insensitive_enum(enum):
+    """Wrap the enum keyword so properties marked with
+    case_insensitive_enums accept any casing of their string values.
+    """
+    folded_enums = {}
+
+    def validate(validator, enums, instance, schema):
+        if schema.get('case_insensitive_enums') and isinstance(instance, str):
+            try:
+                _, folded = folded_enums[id(enums)]
+            except KeyError:
+                folded = frozenset(e.casefold() for e in enums if isinstance(e, str))
+                # Keep a reference to enums, so its id can't be reused.
+                folded_enums[id(enums)] = (enums, folded)
+
+            if instance.casefold() in folded:
+                return
+
+        yield from enum(validator, enums, instance, schema)
+
+    return validate
+
+
+@functools.lru_cache(maxsize=None)
+def get_validator(check_formats=True):
+    """Return a Draft 7 validator for the packaged JSON schema.
+
+    The schema is checked once, and the same validator is returned on every
+    call, so validating an instance only costs the validation itself. The
+    validator understands the case_insensitive_enums keyword, and checks
+    formats such as dates unless check_formats is false.
+    """
+    import jsonschema
+    from jsonschema import Draft7Validator, validators
+
+    NWSSValidator = validators.extend(
+        Draft7Validator,
+        {'enum': _case_insensitive_enum(Draft7Validator.VALIDATORS['enum'])}
+    )
+
+    schema = load_schema()
+    NWSSValidator.check_schema(schema)
+
+    if check_formats:
+        format_checker = getattr(Draft7Validator, 'FORMAT_CHECKER', None) or \
+            jsonschema.draft7_format_checker
+        return NWSSValidator(schema, format_checker=format_checker)
+
+    return NWSSValidator(schema)
 
 
 def dump_schema():
-    json.dump(s, sys.stdout, indent=4)
+    json.dump(get_schema(), sys.stdout, indent=4)
 
 
 if __name__ == "__main__":
-    dump_schema()
+    parser = argparse.ArgumentParser(
+        description='Print the NWSS JSON schema.'
+    )
+    parser.add_argument(
+        '--write-artifact',
+        action='store_true',
+        help=f'Write the schema to {os.path.relpath(ARTIFACT_PATH)} '
+             'instead of printing it.'
+    )
+    args = parser.parse_args()
+
+    if args.write_artifact:
+        write_artifact()
+    else:
+        dump_schema()
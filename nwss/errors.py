@@ -0,0 +1,176 @@
+'''
+Structured validation errors.
+
+marshmallow reports errors as nested dicts, {row: {field: [message]}}.
+RowError is one entry of that dict, so errors can be counted, filtered and
+serialized without walking the nesting. ErrorReport stores many of them
+compactly, with each distinct message kept once.
+'''
+from array import array
+from collections import namedtuple
+
+from marshmallow import ValidationError
+
+
+RowError = namedtuple('RowError', ['row', 'field', 'message'])
+RowError.__doc__ = '''
+One error message for one row. field is the input column, or '_schema' for
+errors of the schema-level checks.
+'''
+
+
+def flatten_errors(row, messages, prefix=None):
+    '''
+    Yield a RowError for each message in the messages of one row, as in
+    ValidationError.messages for a single-row load. Keys of nested errors
+    are joined with dots, e.g. 'county_names.0'.
+    '''
+    for key, value in messages.items():
+        field = key if prefix is None else f'{prefix}.{key}'
+
+        if isinstance(value, dict):
+            yield from flatten_errors(row, value, field)
+        elif isinstance(value, list):
+            for message in value:
+                if isinstance(message, dict):
+                    yield from flatten_errors(row, message, field)
+                else:
+                    yield RowError(row, field, message)
+        else:
+            yield RowError(row, field, value)
+
+
+class LoadError(ValidationError):
+    '''
+    Raised by WaterSampleSchema.load_rows. Besides the usual messages and
+    valid_data, it has errors, a list of RowErrors, and complete, which is
+    False if loading stopped early at max_errors or fail_fast.
+    '''
+
+    def __init__(self, errors, valid_data, complete):
+        messages = {}
+
+        for error in errors:
+            messages.setdefault(error.row, {}) \
+                .setdefault(error.field, []).append(error.message)
+
+        super().__init__(messages, valid_data=valid_data)
+
+        self.errors = errors
+        self.complete = complete
+
+    def report(self):
+        '''Return the errors as an ErrorReport.'''
+        return ErrorReport(self.errors)
+
+
+class ErrorReport():
+    '''
+    Compact store of many RowErrors. Each distinct field and message is
+    kept once, and errors are three parallel integer arrays: rows, field_ids
+    and message_ids, indexes into fields and messages.
+
+    to_dict keeps that shape, so the report serializes to a small JSON
+    object however many rows repeat the same message.
+    '''
+
+    def __init__(self, errors=()):
+        self.fields = []
+        self.messages = []
+        self.rows = array('q')
+        self.field_ids = array('l')
+        self.message_ids = array('l')
+
+        self._field_index = {}
+        self._message_index = {}
+
+        self.extend(errors)
+
+    @classmethod
+    def from_messages(cls, messages):
+        '''
+        Build a report from the messages of a many=True load, as in
+        ValidationError.messages: {row: {field: [message, ...]}}.
+        '''
+        report = cls()
+
+        for row, row_messages in messages.items():
+            if not isinstance(row_messages, dict):
+                raise ValueError('Expected messages keyed by row index.')
+
+            report.extend(flatten_errors(row, row_messages))
+
+        return report
+
+    @classmethod
+    def from_dict(cls, data):
+        '''Rebuild a report from the output of to_dict.'''
+        report = cls()
+
+        report.fields = list(data['fields'])
+        report.messages = list(data['messages'])
+        report.rows = array('q', data['rows'])
+        report.field_ids = array('l', data['field_ids'])
+        report.message_ids = array('l', data['message_ids'])
+
+        report._field_index = {f: i for i, f in enumerate(report.fields)}
+        report._message_index = {m: i for i, m in enumerate(report.messages)}
+
+        return report
+
+    def add(self, row, field, message):
+        field_id = self._field_index.get(field)
+
+        if field_id is None:
+            field_id = self._field_index[field] = len(self.fields)
+            self.fields.append(field)
+
+        message_id = self._message_index.get(message)
+
+        if message_id is None:
+            message_id = self._message_index[message] = len(self.messages)
+            self.messages.append(message)
+
+        self.rows.append(row)
+        self.field_ids.append(field_id)
+        self.message_ids.append(message_id)
+
+    def extend(self, errors):
+        for row, field, message in errors:
+            self.add(row, field, message)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        '''Yield the errors as RowErrors.'''
+        fields = self.fields
+        messages = self.messages
+
+        for row, field_id, message_id in zip(self.rows, self.field_ids, self.message_ids):
+            yield RowError(row, fields[field_id], messages[message_id])
+
+    def to_messages(self):
+        '''
+        Return the errors nested as in ValidationError.messages,
+        {row: {field: [message, ...]}}.
+        '''
+        nested = {}
+
+        for row, field, message in self:
+            nested.setdefault(row, {}).setdefault(field, []).append(message)
+
+        return nested
+
+    def to_dict(self):
+        '''
+        Return a JSON-serializable dict with fields, messages, rows,
+        field_ids and message_ids.
+        '''
+        return {
+            'fields': self.fields,
+            'messages': self.messages,
+            'rows': self.rows.tolist(),
+            'field_ids': self.field_ids.tolist(),
+            'message_ids': self.message_ids.tolist(),
+        }
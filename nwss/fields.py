@@ -1,18 +1,26 @@
+import datetime
+
 from marshmallow import fields
 
 from nwss import validators as nwss_validators
 
 
 class CategoricalString(fields.String):
+    '''
+    String field that accepts any casing of its allowed values. Pass
+    canonicalize=True, or load with a schema that has a truthy canonicalize
+    attribute, to deserialize values to their spelling in nwss.value_sets.
+    '''
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, canonicalize=False, **kwargs):
         try:
             allowed_values = kwargs.pop('allowed_values')
         except KeyError:
             raise TypeError("Missing required keyword argument 'allowed_values'")
 
         # Add allowed value validation
-        kwargs['validate'] = nwss_validators.CaseInsensitiveOneOf(allowed_values)
+        self.allowed_values = nwss_validators.CaseInsensitiveOneOf(allowed_values)
+        kwargs['validate'] = self.allowed_values
 
         # Get error_messages, if provided, or create a fresh dict
         error_messages = kwargs.pop('error_messages', {})
@@ -22,9 +30,25 @@ class CategoricalString(fields.String):
                                       f'Expected one of: {", ".join(allowed_values)}')
         kwargs['error_messages'] = error_messages
 
+        self.canonicalize = canonicalize
+
         # Initialize as normal
         super().__init__(*args, **kwargs)
 
+    def _bind_to_schema(self, field_name, schema):
+        super()._bind_to_schema(field_name, schema)
+        self.canonicalize = self.canonicalize or getattr(schema, 'canonicalize', False)
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        value = super()._deserialize(value, attr, data, **kwargs)
+
+        if self.canonicalize:
+            # Values that aren't allowed pass through unchanged, so the
+            # validator reports the input as the user wrote it.
+            return self.allowed_values.canonical(value)
+
+        return value
+
 
 class ListString(fields.String):
     '''
@@ -33,8 +57,42 @@ class ListString(fields.String):
     '''
 
     def _serialize(self, value, attr, data, **kwargs):
+        if value is None:
+            return None
         return ','.join(value)
 
     def _deserialize(self, value, attr, obj, **kwargs):
         if value:
             return value.split(',')
+
+
+class Date(fields.Date):
+    '''
+    Date field that also accepts date and datetime objects, such as the
+    typed cells of a spreadsheet.
+    '''
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if isinstance(value, datetime.datetime):
+            return value.date()
+
+        if isinstance(value, datetime.date):
+            return value
+
+        return super()._deserialize(value, attr, data, **kwargs)
+
+
+class Time(fields.Time):
+    '''
+    Time field that also accepts time and datetime objects, such as the
+    typed cells of a spreadsheet.
+    '''
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if isinstance(value, datetime.datetime):
+            return value.time()
+
+        if isinstance(value, datetime.time):
+            return value
+
+        return super()._deserialize(value, attr, data, **kwargs)
@@ -0,0 +1,150 @@
+import collections
+import functools
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from marshmallow import ValidationError
+
+from nwss.schemas import WaterSampleSchema
+from nwss.stages import run_stages
+
+
+# Each worker process builds its own schema once, in _init_worker.
+_worker_schema = None
+
+
+def _init_worker(schema_kwargs):
+    global _worker_schema
+    # Workers get their own unpickled copy of each chunk, so there is no
+    # need to copy rows again to normalize them.
+    _worker_schema = WaterSampleSchema(**{'normalize_in_place': True, **schema_kwargs})
+
+
+def _load_chunk(latest_date, start, rows):
+    return _load_shared_chunk(_worker_schema, latest_date, start, rows)
+
+
+def _load_shared_chunk(schema, latest_date, start, rows):
+    # Every chunk is checked against the latest_date read when loading
+    # started, in whichever thread or process loads it.
+    with schema._batch_clock(latest_date):
+        return [
+            (start + index, data, errors)
+            for index, data, errors in schema.iter_load(rows)
+        ]
+
+
+def chunked(rows, chunk_size):
+    """Split an iterable of rows into (start_index, list_of_rows) chunks."""
+    rows = iter(rows)
+    start = 0
+
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+
+        if not chunk:
+            return
+
+        yield start, chunk
+        start += len(chunk)
+
+
+def iter_load_parallel(rows, chunk_size=1000, max_workers=None, threads=False,
+                       **schema_kwargs):
+    """Validate rows across a pool of processes, or of threads with
+    threads=True.
+
+    Yields (row_index, data, errors) tuples in input order, like
+    WaterSampleSchema.iter_load. Keyword arguments other than chunk_size,
+    max_workers and threads are passed to the WaterSampleSchema built in
+    each worker process, or to the one schema the threads share.
+    At most two chunks per worker are read ahead of the consumer, and every
+    chunk is checked against the same latest_date, read once here.
+
+    Threads avoid pickling rows and results, but only run in parallel on
+    a free-threaded Python build; with the GIL they take turns. A cache or
+    a profile is only shared with threads, and raises ValueError with
+    processes. In both
+    modes stages run in the calling thread, on the results in order, as
+    with iter_load.
+    """
+    # Each process would fill a copy of its own, and their locks cannot be
+    # pickled for workers that are spawned rather than forked.
+    in_workers = [
+        name for name in ('cache', 'profile') if schema_kwargs.get(name) is not None
+    ]
+
+    if in_workers and not threads:
+        raise ValueError(
+            f'{" and ".join(in_workers)} cannot be shared with worker processes, '
+            'use threads=True.'
+        )
+
+    max_workers = max_workers or os.cpu_count() or 1
+    # Stages hold the state of the whole submission, so they see every
+    # chunk's results here rather than a copy in each worker.
+    stages = schema_kwargs.pop('stages', ())
+    schema = WaterSampleSchema(**schema_kwargs)
+    latest_date = schema.latest_date()
+
+    if threads:
+        executor = ThreadPoolExecutor(max_workers)
+        load = functools.partial(_load_shared_chunk, schema, latest_date)
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers,
+            initializer=_init_worker,
+            initargs=(schema_kwargs,)
+        )
+        load = functools.partial(_load_chunk, latest_date)
+
+    results = _iter_chunks(executor, load, rows, chunk_size, max_workers)
+
+    if stages:
+        results = run_stages(stages, results, schema.batch_size)
+
+    yield from results
+
+
+def _iter_chunks(executor, load, rows, chunk_size, max_workers):
+    with executor:
+        pending = collections.deque()
+
+        for start, chunk in chunked(rows, chunk_size):
+            pending.append(executor.submit(load, start, chunk))
+
+            if len(pending) >= max_workers * 2:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def load_parallel(rows, chunk_size=1000, max_workers=None, threads=False,
+                  **schema_kwargs):
+    """Validate rows across a pool of processes, or of threads with
+    threads=True, and return the loaded data.
+
+    Raises a ValidationError whose messages are keyed by row index, like
+    WaterSampleSchema(many=True).load.
+    """
+    results = []
+    errors = {}
+
+    for index, data, row_errors in iter_load_parallel(
+        rows,
+        chunk_size=chunk_size,
+        max_workers=max_workers,
+        threads=threads,
+        **schema_kwargs
+    ):
+        results.append(data)
+
+        if row_errors:
+            errors[index] = row_errors
+
+    if errors:
+        raise ValidationError(errors, valid_data=results)
+
+    return results
@@ -0,0 +1,119 @@
+'''
+Time where a load spends its time, field by field and rule by rule.
+
+Pass a Profile to WaterSampleSchema(profile=...) and every field
+deserializer, which includes the field's validators such as Regexp or
+CaseInsensitiveOneOf, and every @validates and @validates_schema check of
+that schema instance is timed. Schemas without a profile are not touched,
+so profiling costs nothing when it is off.
+'''
+import threading
+import time
+from collections import namedtuple
+
+from marshmallow import ValidationError
+from marshmallow.decorators import VALIDATES, VALIDATES_SCHEMA
+
+from nwss.utils import schema_hooks
+
+
+FIELD = 'field'
+FIELD_VALIDATOR = 'field validator'
+SCHEMA_VALIDATOR = 'schema validator'
+
+Timing = namedtuple('Timing', ['name', 'kind', 'calls', 'seconds', 'failures'])
+
+
+class Profile():
+    '''
+    Call counts, cumulative time and failure counts, where a failure is a
+    ValidationError, of the checks of the schemas it is attached to.
+
+    callback, if given, is called after every check as
+    callback(name, kind, seconds, failed), e.g. to feed a metrics exporter.
+    A Profile can be shared by schemas used from several threads.
+    '''
+
+    def __init__(self, callback=None, clock=time.perf_counter):
+        self.callback = callback
+        self._clock = clock
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def attach(self, schema):
+        '''
+        Time the fields and validators of a schema instance. Other
+        instances of its class are not affected.
+        '''
+        for name, field_obj in schema.load_fields.items():
+            field_obj.deserialize = self._timed(
+                field_obj.deserialize, field_obj.data_key or name, FIELD
+            )
+
+        for hook, kind in [(VALIDATES, FIELD_VALIDATOR),
+                           (VALIDATES_SCHEMA, SCHEMA_VALIDATOR)]:
+            for attr_name, _, _ in schema_hooks(schema, hook):
+                # marshmallow looks validators up on the instance, so this
+                # shadows the method or rule of the class. Older releases
+                # also read the hook's options from what they find there.
+                validator = getattr(schema, attr_name)
+                timed = self._timed(validator, attr_name, kind)
+                timed.__marshmallow_hook__ = validator.__marshmallow_hook__
+                setattr(schema, attr_name, timed)
+
+    def _timed(self, function, name, kind):
+        clock = self._clock
+        record = self._record
+
+        def timed(*args, **kwargs):
+            start = clock()
+
+            try:
+                result = function(*args, **kwargs)
+            except ValidationError:
+                record(name, kind, clock() - start, True)
+                raise
+
+            record(name, kind, clock() - start, False)
+            return result
+
+        return timed
+
+    def _record(self, name, kind, seconds, failed):
+        with self._lock:
+            stats = self._stats.get(name)
+
+            if stats is None:
+                stats = self._stats[name] = [kind, 0, 0.0, 0]
+
+            stats[1] += 1
+            stats[2] += seconds
+            stats[3] += failed
+
+        if self.callback is not None:
+            self.callback(name, kind, seconds, failed)
+
+    def report(self):
+        '''
+        Return a Timing for each check that ran, slowest first in total.
+        '''
+        with self._lock:
+            timings = [Timing(name, *stats) for name, stats in self._stats.items()]
+
+        return sorted(timings, key=lambda timing: timing.seconds, reverse=True)
+
+    def to_dict(self):
+        '''
+        Return the report as {name: {'kind', 'calls', 'seconds', 'failures'}},
+        which can be serialized as JSON.
+        '''
+        return {
+            name: {'kind': kind, 'calls': calls, 'seconds': seconds,
+                   'failures': failures}
+            for name, kind, calls, seconds, failures in self.report()
+        }
+
+    def reset(self):
+        '''Forget everything recorded so far.'''
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,161 @@
+'''
+Declarative cross-field rules.
+
+A ConditionalRequirement is declared once on a schema class and used two
+ways: marshmallow calls it as a @validates_schema method, and
+dump_to_jsonschema turns it into an if/then entry of the JSON schema's
+allOf. Both paths therefore enforce the same rule.
+'''
+from marshmallow import ValidationError, validates_schema
+from marshmallow.decorators import VALIDATES_SCHEMA
+
+from nwss.utils import schema_hooks
+
+
+class Present():
+    '''
+    The field has a truthy value, as in data.get(field).
+    '''
+
+    def __init__(self, field):
+        self.field = field
+
+    def holds(self, data):
+        return bool(data.get(self.field))
+
+    def to_jsonschema(self, properties):
+        types = properties.get(self.field, {}).get('type', [])
+
+        if 'number' in types or 'integer' in types:
+            # Zero is falsy in Python, so it does not count as a value.
+            constraint = {'type': ['number'], 'not': {'const': 0}}
+        elif 'string' in types:
+            constraint = {'type': ['string'], 'minLength': 1}
+        else:
+            constraint = {'not': {'type': 'null'}}
+
+        return {'properties': {self.field: constraint}, 'required': [self.field]}
+
+
+class OneOf():
+    '''
+    The field is one of values. With ignore_case, for categorical fields
+    that accept any casing, string values are compared ignoring case.
+    '''
+
+    def __init__(self, field, values, ignore_case=False):
+        self.field = field
+        self.values = list(values)
+        self.ignore_case = ignore_case
+
+        if ignore_case:
+            self._choices = {v.casefold() if isinstance(v, str) else v for v in values}
+        else:
+            self._choices = set(self.values)
+
+    def holds(self, data):
+        value = data.get(self.field)
+
+        if self.ignore_case and isinstance(value, str):
+            value = value.casefold()
+
+        return value in self._choices
+
+    def to_jsonschema(self, properties):
+        constraint = {'enum': self.values}
+
+        if self.ignore_case:
+            constraint['case_insensitive_enums'] = True
+
+        return {'properties': {self.field: constraint}, 'required': [self.field]}
+
+
+class NotEqual():
+    '''
+    The field is not equal to value. A missing field is not equal.
+    '''
+
+    def __init__(self, field, value):
+        self.field = field
+        self.value = value
+
+    def holds(self, data):
+        return data.get(self.field) != self.value
+
+    def to_jsonschema(self, properties):
+        return {
+            'not': {
+                'properties': {self.field: {'const': self.value}},
+                'required': [self.field],
+            }
+        }
+
+
+class ConditionalRequirement():
+    '''
+    If any condition in when holds for a row, every condition in then must
+    hold too, or the row fails with message.
+
+    Assign an instance to an attribute of a schema class, in place of a
+    @validates_schema method.
+    '''
+
+    def __init__(self, when, then, message):
+        self.when = list(when)
+        self.then = list(then)
+        self.message = message
+
+        validates_schema(self)
+
+    def __call__(self, data, **kwargs):
+        if any(condition.holds(data) for condition in self.when) \
+           and not all(condition.holds(data) for condition in self.then):
+            raise ValidationError(self.message)
+
+    def to_jsonschema(self, properties):
+        '''
+        Return the rule as a JSON schema if/then object, given the
+        schema's properties.
+        '''
+        when = [condition.to_jsonschema(properties) for condition in self.when]
+        then = [condition.to_jsonschema(properties) for condition in self.then]
+
+        return {
+            'if': when[0] if len(when) == 1 else {'anyOf': when},
+            'then': _merge(then),
+        }
+
+
+def _merge(schemas):
+    '''
+    Combine properties/required objects into one, or use allOf.
+    '''
+    if not all(set(schema) <= {'properties', 'required'} for schema in schemas):
+        return schemas[0] if len(schemas) == 1 else {'allOf': schemas}
+
+    merged = {'properties': {}, 'required': []}
+
+    for schema in schemas:
+        merged['properties'].update(schema.get('properties', {}))
+        merged['required'] += schema.get('required', [])
+
+    return merged
+
+
+def schema_rules(schema):
+    '''
+    Return (name, rule) pairs for the ConditionalRequirements on a schema,
+    in the order marshmallow runs them.
+    '''
+    rules = []
+
+    # Rules are read from the class, as a profiled instance wraps them.
+    schema_class = schema if isinstance(schema, type) else type(schema)
+
+    for attr_name, _, _ in schema_hooks(schema_class, VALIDATES_SCHEMA):
+        rule = getattr(schema_class, attr_name)
+
+        if isinstance(rule, ConditionalRequirement):
+            rules.append((attr_name, rule))
+
+    return rules
@@ -1,12 +1,23 @@
+import contextlib
+import contextvars
+import functools
 import re
+import threading
+
 from marshmallow import Schema, fields, \
     validate, ValidationError, validates_schema, validates
 from marshmallow.decorators import pre_load
 
-from nwss import value_sets, fields as nwss_fields, validators as nwss_validators
+from nwss import value_sets, rules, cache as nwss_cache, errors as nwss_errors, \
+    fields as nwss_fields, stages as nwss_stages
 from nwss.utils import get_future_date
 
 
+# The latest date of the batch each schema is loading, {id(schema): date}.
+# Each thread and asyncio task has its own, and schemas stay picklable.
+_batch_dates = contextvars.ContextVar('nwss_batch_dates', default={})
+
+
 class CollectionSite():
     reporting_jurisdiction = nwss_fields.CategoricalString(
         required=True,
@@ -48,12 +59,12 @@ class CollectionSite():
         allow_none=True
     )
 
-    @validates_schema
-    def validate_sample_location(self, data, **kwargs):
-        if data['sample_location'] == 'upstream' \
-          and not data.get('sample_location_specify', None):
-            raise ValidationError('An "upstream" sample_location must have '
-                                  'a value for sample_location_specify.')
+    validate_sample_location = rules.ConditionalRequirement(
+        when=[rules.OneOf('sample_location', ['upstream'], ignore_case=True)],
+        then=[rules.Present('sample_location_specify')],
+        message='An "upstream" sample_location must have '
+                'a value for sample_location_specify.'
+    )
 
     institution_type = nwss_fields.CategoricalString(
         required=True,
@@ -89,14 +100,14 @@ class WWTP():
         metadata={'units': 'Percent'}
     )
 
-    stormwater_input = fields.String(
+    stormwater_input = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.yes_no_empty)
+        allowed_values=value_sets.yes_no_empty
     )
 
-    influent_equilibrated = fields.String(
+    influent_equilibrated = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.yes_no_empty)
+        allowed_values=value_sets.yes_no_empty
     )
 
 
@@ -131,29 +142,27 @@ class CollectionMethod():
         metadata={'units': 'Celsius'}
     )
 
-    pretreatment = fields.String(
+    pretreatment = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.yes_no_empty)
+        allowed_values=value_sets.yes_no_empty
     )
 
     pretreatment_specify = fields.String(
         allow_none=True,
     )
 
-    @validates_schema
-    def validate_pretreatment(self, data, **kwargs):
-        if data['pretreatment'] == 'yes' \
-          and not data.get('pretreatment_specify'):
-            raise ValidationError(
-                'If "pretreatment" is "yes", then specify '
+    validate_pretreatment = rules.ConditionalRequirement(
+        when=[rules.OneOf('pretreatment', ['yes'], ignore_case=True)],
+        then=[rules.Present('pretreatment_specify')],
+        message='If "pretreatment" is "yes", then specify '
                 'the chemicals used.'
-            )
+    )
 
 
 class ProcessingMethod():
-    solids_separation = fields.String(
+    solids_separation = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.solids_separation)
+        allowed_values=value_sets.solids_separation
     )
 
     concentration_method = nwss_fields.CategoricalString(
@@ -194,9 +203,9 @@ class ProcessingMethod():
         metadata={'units': 'mL'}
     )
 
-    ext_blank = fields.String(
+    ext_blank = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.yes_no_empty)
+        allowed_values=value_sets.yes_no_empty
     )
 
     rec_eff_percent = fields.Float(
@@ -205,14 +214,14 @@ class ProcessingMethod():
         metadata={'units': 'percent'}
     )
 
-    rec_eff_target_name = fields.String(
+    rec_eff_target_name = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.rec_eff_target_name)
+        allowed_values=value_sets.rec_eff_target_name
     )
 
-    rec_eff_spike_matrix = fields.String(
+    rec_eff_spike_matrix = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.rec_eff_spike_matrix)
+        allowed_values=value_sets.rec_eff_spike_matrix
     )
 
     rec_eff_spike_conc = fields.Float(
@@ -220,27 +229,23 @@ class ProcessingMethod():
         metadata={'units': 'log10 copies/mL'}
     )
 
-    @validates_schema
-    def validate_rec_eff(self, data, **kwargs):
-        dependent = [
-            'rec_eff_target_name',
-            'rec_eff_spike_matrix',
-            'rec_eff_spike_conc'
-        ]
-
-        if data['rec_eff_percent'] != -1 \
-           and not all(data.get(k) for k in dependent):
-            raise ValidationError(
-                "If rec_eff_percent is not equal to -1, "
+    validate_rec_eff = rules.ConditionalRequirement(
+        when=[rules.NotEqual('rec_eff_percent', -1)],
+        then=[
+            rules.Present('rec_eff_target_name'),
+            rules.Present('rec_eff_spike_matrix'),
+            rules.Present('rec_eff_spike_conc'),
+        ],
+        message="If rec_eff_percent is not equal to -1, "
                 "then 'rec_eff_target_name', "
                 "'rec_eff_spike_matrix', "
                 "and 'rec_eff_spike_conc' "
                 "cannot be empty."
-            )
+    )
 
-    pasteurized = fields.String(
+    pasteurized = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.yes_no_empty)
+        allowed_values=value_sets.yes_no_empty
     )
 
 
@@ -268,119 +273,92 @@ class QuantificationMethod():
         metadata={'units': "specified in 'hum_frac_mic_unit'"}
     )
 
-    hum_frac_mic_unit = fields.String(
+    hum_frac_mic_unit = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.mic_units)
+        allowed_values=value_sets.mic_units
     )
 
-    hum_frac_target_mic = fields.String(
+    hum_frac_target_mic = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.hum_frac_target_mic)
+        allowed_values=value_sets.hum_frac_target_mic
     )
 
     hum_frac_target_mic_ref = fields.String(
         allow_none=True
     )
 
-    @validates_schema
-    def validate_hum_frac_mic_conc(self, data, **kwargs):
-        """
-        If hum_frac_mic_conc is not empty, then
-         validate that the dependent fields
-         are not empty.
-        """
-        dependent = [
-            'hum_frac_mic_unit',
-            'hum_frac_target_mic',
-            'hum_frac_target_mic_ref'
-        ]
-
-        if data.get('hum_frac_mic_conc') \
-           and not all(data.get(key) for key in dependent):
-            raise ValidationError(
-                'If hum_frac_mic_conc is not empty, then '
+    validate_hum_frac_mic_conc = rules.ConditionalRequirement(
+        when=[rules.Present('hum_frac_mic_conc')],
+        then=[
+            rules.Present('hum_frac_mic_unit'),
+            rules.Present('hum_frac_target_mic'),
+            rules.Present('hum_frac_target_mic_ref'),
+        ],
+        message='If hum_frac_mic_conc is not empty, then '
                 'must provide hum_frac_mic_unit, '
                 'hum_frac_target_mic, and '
                 'hum_frac_target_mic_ref.'
-            )
+    )
 
     hum_frac_chem_conc = fields.Float(
         allow_none=True,
         metadata={'units': "specified in 'hum_frac_chem_unit'."}
     )
 
-    hum_frac_chem_unit = fields.String(
+    hum_frac_chem_unit = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.chem_units)
+        allowed_values=value_sets.chem_units
     )
 
-    hum_frac_target_chem = fields.String(
+    hum_frac_target_chem = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.hum_frac_target_chem)
+        allowed_values=value_sets.hum_frac_target_chem
     )
 
     hum_frac_target_chem_ref = fields.String(
         allow_none=True
     )
 
-    @validates_schema
-    def validate_hum_frac_chem_conc(self, data, **kwargs):
-        """
-        If hum_frac_chem_conc is not empty, then
-         validate that the dependent fields
-         are not empty.
-        """
-        dependent = [
-            'hum_frac_chem_unit',
-            'hum_frac_target_chem',
-            'hum_frac_target_chem_ref'
-        ]
-
-        if data.get('hum_frac_chem_conc') \
-           and not all(data.get(key) for key in dependent):
-            raise ValidationError(
-                'If hum_frac_chem_unit is not empty, '
+    validate_hum_frac_chem_conc = rules.ConditionalRequirement(
+        when=[rules.Present('hum_frac_chem_conc')],
+        then=[
+            rules.Present('hum_frac_chem_unit'),
+            rules.Present('hum_frac_target_chem'),
+            rules.Present('hum_frac_target_chem_ref'),
+        ],
+        message='If hum_frac_chem_unit is not empty, '
                 'then hum_frac_chem_unit, hum_frac_target_chem, '
                 'and hum_frac_target_chem_ref cannot be null.'
-            )
+    )
 
     other_norm_conc = fields.Float(
         allow_none=True
     )
 
-    other_norm_name = fields.String(
+    other_norm_name = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.other_norm_name)
+        allowed_values=value_sets.other_norm_name
     )
 
-    other_norm_unit = fields.String(
+    other_norm_unit = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.mic_chem_units)
+        allowed_values=value_sets.mic_chem_units
     )
 
     other_norm_ref = fields.String(
         allow_none=True
     )
 
-    @validates_schema
-    def validate_other_norm_conc(self, data, **kwargs):
-        """
-        If other_norm_conc is not empty, then
-         validate that the dependent fields
-         are not empty.
-        """
-        dependent = [
-            'other_norm_name',
-            'other_norm_unit',
-            'other_norm_ref'
-        ]
-
-        if data.get('other_norm_conc') \
-           and not all(data.get(key) for key in dependent):
-            raise ValidationError(
-                    'If other_norm_conc is not empty, then '
-                    'other_norm_name cannot be null.'
-            )
+    validate_other_norm_conc = rules.ConditionalRequirement(
+        when=[rules.Present('other_norm_conc')],
+        then=[
+            rules.Present('other_norm_name'),
+            rules.Present('other_norm_unit'),
+            rules.Present('other_norm_ref'),
+        ],
+        message='If other_norm_conc is not empty, then '
+                'other_norm_name cannot be null.'
+    )
 
     quant_stan_type = nwss_fields.CategoricalString(
         required=True,
@@ -405,22 +383,20 @@ class QuantificationMethod():
         required=True
     )
 
-    @validates_schema
-    def validate_inhibition_detect(self, data, **kwargs):
-        if data['inhibition_detect'] == 'yes' \
-           and not data['inhibition_adjust']:
-            raise ValidationError(
-                "If 'inhibition_detect' is yes, "
+    validate_inhibition_detect = rules.ConditionalRequirement(
+        when=[rules.OneOf('inhibition_detect', ['yes'], ignore_case=True)],
+        then=[rules.Present('inhibition_adjust')],
+        message="If 'inhibition_detect' is yes, "
                 "then 'inhibition_adjust' must have "
                 "a non-empty value."
-            )
+    )
 
-        if data['inhibition_detect'] == 'not tested' \
-           and data['inhibition_method'] != 'none':
-            raise ValidationError(
-                "'inhibition_method' must be 'none' "
+    validate_inhibition_not_tested = rules.ConditionalRequirement(
+        when=[rules.OneOf('inhibition_detect', ['not tested'], ignore_case=True)],
+        then=[rules.OneOf('inhibition_method', ['none'])],
+        message="'inhibition_method' must be 'none' "
                 "if inhibition_detect == 'not tested'."
-            )
+    )
 
     num_no_target_control = nwss_fields.CategoricalString(
         required=True,
@@ -429,21 +405,19 @@ class QuantificationMethod():
 
 
 class Sample():
-    sample_collect_date = fields.Date(
+    sample_collect_date = nwss_fields.Date(
         required=True
     )
 
     @validates('sample_collect_date')
     def validate_sample_collect_date(self, value):
-        tomorrow = get_future_date(24)
-
-        if value > tomorrow:
+        if value > self.latest_date():
             raise ValidationError(
                 "'sample_collect_date' cannot be after "
                 "tomorrow's date."
             )
 
-    sample_collect_time = fields.Time(
+    sample_collect_time = nwss_fields.Time(
         required=True
     )
 
@@ -458,32 +432,19 @@ class Sample():
         metadata={'units': 'Million gallons per day (MGD)'}
     )
 
-    @validates_schema
-    def validate_flow_rate(self, data, **kwargs):
-        flowing_source = set([
-            'raw wastewater',
-            'post grit removal',
-            'primary effluent',
-            'secondary effluent'
-        ])
-
-        per_volume_result = set([
-            'copies/L wastewater',
-            'log10 copies/L wastewater',
-            'micrograms/L wastewater',
-            'log10 micrograms/L wastewater',
-        ])
-
-        if (data['sample_matrix'] in flowing_source
-           or data['sars_cov2_units'] in per_volume_result) \
-           and not data['flow_rate']:
-
-            raise ValidationError(
-                "If 'sample_matrix' is liquid sampled from flowing source "
-                f"({', '.join(flowing_source)}) or 'sars_cov2_units' is "
-                f"on a per volume basis ({', '.join(per_volume_result)}) "
+    validate_flow_rate = rules.ConditionalRequirement(
+        when=[
+            rules.OneOf('sample_matrix', value_sets.flowing_source, ignore_case=True),
+            rules.OneOf(
+                'sars_cov2_units', value_sets.per_volume_result, ignore_case=True
+            ),
+        ],
+        then=[rules.Present('flow_rate')],
+        message="If 'sample_matrix' is liquid sampled from flowing source "
+                f"({', '.join(value_sets.flowing_source)}) or 'sars_cov2_units' is "
+                f"on a per volume basis ({', '.join(value_sets.per_volume_result)}) "
                 "then 'flow_rate' must have a non-empty value."
-            )
+    )
 
     ph = fields.Float(
         allow_none=True,
@@ -526,17 +487,15 @@ class Sample():
 
 
 class QuantificationResults():
-    test_result_date = fields.Date(
+    test_result_date = nwss_fields.Date(
         required=True
     )
 
     @validates_schema
     def validate_test_result_date(self, data, **kwargs):
-        tomorrow = get_future_date(24)
-
         result_date = data['test_result_date']
 
-        if result_date > tomorrow:
+        if result_date > self.latest_date():
             raise ValidationError(
                 "'test_result_date' cannot be after "
                 "tomorrow's date."
@@ -589,9 +548,9 @@ class QuantificationResults():
         metadata={'units': 'specified in sars_cov2_units'}
     )
 
-    quality_flag = fields.String(
+    quality_flag = nwss_fields.CategoricalString(
         allow_none=True,
-        validate=nwss_validators.CaseInsensitiveOneOf(value_sets.yes_no_empty)
+        allowed_values=value_sets.yes_no_empty
     )
 
 
@@ -608,9 +567,213 @@ class WaterSampleSchema(
     class Meta:
         additional_properties = True
 
+    def __init__(self, *args, canonicalize=False, reference_date=None,
+                 normalize_in_place=False, cache=None, stages=(),
+                 batch_size=1000, profile=None, **kwargs):
+        """Pass canonicalize=True to load categorical values with their
+        spelling in nwss.value_sets, e.g. 'YES' loads as 'yes'.
+
+        Dates are checked against tomorrow's date. Pass reference_date to
+        use the day after it instead, e.g. when reprocessing old batches.
+
+        Pass normalize_in_place=True to replace empty strings with None in
+        the input rows themselves instead of in copies. Only do this if the
+        rows are not used after loading, as with a csv.DictReader.
+
+        Pass a backend from nwss.cache as cache to reuse the results of
+        rows validated before in iter_load and load_rows.
+
+        Pass stages from nwss.stages to run checks across rows, such as
+        duplicate detection, in iter_load and load_rows.
+
+        Pass an nwss.profiling.Profile as profile to time every field and
+        validator of this instance.
+        """
+        # Set before fields are bound, so CategoricalString can see it.
+        self.canonicalize = canonicalize
+        self.reference_date = reference_date
+        self.normalize_in_place = normalize_in_place
+        self.cache = cache
+        self.stages = list(stages)
+        self.batch_size = batch_size
+        super().__init__(*args, **kwargs)
+
+        self.profile = profile
+
+        if profile is not None:
+            profile.attach(self)
+
+    def latest_date(self):
+        """Return the latest date allowed for sample_collect_date and
+        test_result_date: the day after reference_date, or after today.
+
+        During a load the date is read once, so every row of a batch is
+        checked against the same bound, even if the batch runs past
+        midnight.
+        """
+        latest = _batch_dates.get().get(id(self))
+
+        if latest is None:
+            latest = get_future_date(24, self.reference_date)
+
+        return latest
+
+    @contextlib.contextmanager
+    def _batch_clock(self, latest_date=None):
+        dates = _batch_dates.get()
+
+        # Nested loads, e.g. iter_load calling load, keep the outer bound.
+        if dates.get(id(self)) is not None:
+            yield
+            return
+
+        # A bound read earlier, e.g. by a stream validated in chunks on
+        # other threads, can be passed in.
+        latest_date = latest_date or get_future_date(24, self.reference_date)
+        _batch_dates.set({**dates, id(self): latest_date})
+
+        try:
+            yield
+        finally:
+            _batch_dates.set(dates)
+
+    def load(self, *args, **kwargs):
+        with self._batch_clock():
+            return super().load(*args, **kwargs)
+
     @pre_load
     def cast_to_none(self, raw_data, **kwargs):
         """Cast empty strings to None to provide for the use of
         the allow_none flag by optional numeric fields.
         """
-        return {k: v if v != '' else None for k, v in raw_data.items()}
+        # Rows without empty strings are loaded as they are.
+        if '' not in raw_data.values():
+            return raw_data
+
+        if not self.normalize_in_place:
+            return {k: v if v != '' else None for k, v in raw_data.items()}
+
+        for k, v in raw_data.items():
+            if v == '':
+                raw_data[k] = None
+
+        return raw_data
+
+    def iter_load(self, rows):
+        """Load rows one at a time from any iterable of dicts, such as a
+        csv.DictReader, so memory use does not grow with the input.
+
+        Yields a (row_index, data, errors) tuple for each row. errors is
+        empty if the row is valid; otherwise data holds the fields that did
+        validate. Unlike load(many=True), schema-level checks are skipped
+        only for rows with field errors of their own. Dates in every row
+        are checked against the same latest_date.
+
+        With stages, rows are loaded batch_size at a time, and each batch
+        goes through the stages before its rows are yielded.
+        """
+        with self._batch_clock():
+            if self.cache is not None:
+                results = self._iter_load_cached(rows)
+            else:
+                results = self._iter_load_rows(rows)
+
+            if self.stages:
+                results = nwss_stages.run_stages(self.stages, results, self.batch_size)
+
+            yield from results
+
+    def _iter_load_rows(self, rows):
+        for index, row in enumerate(rows):
+            try:
+                data = self.load(row, many=False)
+            except ValidationError as e:
+                yield index, e.valid_data, e.messages
+            else:
+                yield index, data, {}
+
+    def _iter_load_cached(self, rows):
+        cache = nwss_cache.RowCache(self, self.cache)
+
+        for index, row in enumerate(rows):
+            key = cache.key(row)
+            data = cache.get(key)
+
+            if data is not None:
+                yield index, data, {}
+                continue
+
+            try:
+                data = self.load(row, many=False)
+            except ValidationError as e:
+                yield index, e.valid_data, e.messages
+            else:
+                cache.set(key, data)
+                yield index, data, {}
+
+    def load_rows(self, rows, max_errors=None, fail_fast=False):
+        """Load an iterable of rows, stopping early on errors.
+
+        With max_errors, loading stops once that many error messages have
+        been collected; with fail_fast, it stops after the first row with
+        errors. Returns the loaded rows if every row is valid, otherwise
+        raises nwss.errors.LoadError with the errors found so far as
+        RowErrors. Rows are checked as in iter_load.
+        """
+        results = []
+        errors = []
+
+        if fail_fast:
+            max_errors = 1
+
+        # Close iter_load when stopping early, which releases its clock.
+        with contextlib.closing(self.iter_load(rows)) as loaded:
+            for index, data, row_errors in loaded:
+                results.append(data)
+
+                if not row_errors:
+                    continue
+
+                errors.extend(nwss_errors.flatten_errors(index, row_errors))
+
+                if max_errors is not None and len(errors) >= max_errors:
+                    if not fail_fast:
+                        del errors[max_errors:]
+
+                    raise nwss_errors.LoadError(errors, results, complete=False)
+
+        if errors:
+            raise nwss_errors.LoadError(errors, results, complete=True)
+
+        return results
+
+
+_shared_schema_lock = threading.Lock()
+
+
+def shared_schema(many=False, partial=None, unknown=None, canonicalize=False):
+    """Return a WaterSampleSchema for these options that is built once per
+    process and shared, instead of building a new one for every request.
+
+    The same instance is returned for the same options, from any thread.
+    It can load from several threads at once, as loading does not change
+    the schema, but do not set attributes on it. Schemas with a cache,
+    stages or a profile hold state of their own, so build those directly.
+    """
+    if partial is not None and not isinstance(partial, bool):
+        partial = tuple(sorted(partial))
+
+    # Only one thread builds a missing schema, so every caller gets the
+    # same instance.
+    with _shared_schema_lock:
+        return _build_shared_schema(many, partial, unknown, canonicalize)
+
+
+@functools.lru_cache(maxsize=None)
+def _build_shared_schema(many, partial, unknown, canonicalize):
+    options = {'many': many, 'partial': partial, 'canonicalize': canonicalize}
+
+    if unknown is not None:
+        options['unknown'] = unknown
+
+    return WaterSampleSchema(**options)
@@ -0,0 +1,315 @@
+'''
+Checks that look across rows, run by iter_load on batches of loaded rows.
+
+Field and schema validators see one row at a time. A Stage sees a batch of
+valid rows and can reject rows because of other rows, such as duplicates.
+Pass stages to WaterSampleSchema(stages=[...]); their messages are added to
+the row's '_schema' errors, like those of the schema-level checks.
+
+A stage holds the state of one submission, so give each load its own
+stages; do not share them between loads running at the same time.
+'''
+import functools
+import hashlib
+import itertools
+import os
+import sqlite3
+import tempfile
+
+from marshmallow.exceptions import SCHEMA
+
+
+# The natural key of a sample, which must be unique within a submission.
+DUPLICATE_KEYS = ('sample_id', 'lab_id', 'pcr_target', 'sample_collect_date')
+
+# A sample and target that may only be accepted once, across submissions.
+UNIQUE_KEYS = ('sample_id', 'lab_id', 'pcr_target')
+
+# sqlite's default limit on parameters per statement is 999.
+_MAX_PARAMETERS = 900
+
+
+class Stage():
+    '''
+    Base class for cross-row checks. Subclasses implement check.
+    '''
+
+    def check(self, batch):
+        '''
+        Check a list of (row_index, data) pairs of valid rows, in input
+        order, and return {row_index: [message, ...]} for rows that fail.
+        '''
+        raise NotImplementedError
+
+
+def run_stages(stages, results, batch_size):
+    '''
+    Run stages over (row_index, data, errors) results from iter_load, a
+    batch at a time, and yield them with the stages' errors added. Each
+    stage only sees rows that are still valid.
+    '''
+    results = iter(results)
+
+    while True:
+        batch = list(itertools.islice(results, batch_size))
+
+        if not batch:
+            return
+
+        for stage in stages:
+            valid = [(index, data) for index, data, errors in batch if not errors]
+
+            if not valid:
+                break
+
+            failed = stage.check(valid)
+
+            if failed:
+                for index, data, errors in batch:
+                    if index in failed:
+                        errors.setdefault(SCHEMA, []).extend(failed[index])
+
+        yield from batch
+
+
+@functools.lru_cache(maxsize=None)
+def _categorical_fields():
+    # Imported here, as the schemas import this module.
+    from nwss.fields import CategoricalString
+    from nwss.schemas import WaterSampleSchema
+
+    return frozenset(
+        name for name, field_obj in WaterSampleSchema._declared_fields.items()
+        if isinstance(field_obj, CategoricalString)
+    )
+
+
+def key_digest(data, keys):
+    '''
+    Return a short digest of the values of keys in loaded data, which is
+    smaller to index than the values themselves. Categorical values, such
+    as pcr_target, are compared ignoring case; other strings, such as
+    sample_id, must match exactly.
+    '''
+    categorical = _categorical_fields()
+    values = repr(tuple(
+        value.casefold() if key in categorical and isinstance(value, str) else value
+        for key, value in ((key, data.get(key)) for key in keys)
+    ))
+    return hashlib.blake2b(values.encode('utf-8'), digest_size=16).digest()
+
+
+def lookup(connection, table, column, digests):
+    '''
+    Return {digest: value of column} for the digests found in table,
+    querying in as few statements as sqlite allows.
+    '''
+    found = {}
+    digests = list(digests)
+
+    for start in range(0, len(digests), _MAX_PARAMETERS):
+        chunk = digests[start:start + _MAX_PARAMETERS]
+        placeholders = ', '.join('?' * len(chunk))
+
+        found.update(connection.execute(
+            f'SELECT key, {column} FROM {table} WHERE key IN ({placeholders})', chunk
+        ))
+
+    return found
+
+
+class DuplicateCheck(Stage):
+    '''
+    Reject rows with the same sample_id, lab_id, pcr_target and
+    sample_collect_date as an earlier row. duplicates lists
+    (row_index, first_row_index) pairs.
+
+    Keys are indexed in memory. With spill_after, once more than that many
+    keys are indexed they are moved to a sqlite database at spill_path, or
+    in a temporary directory, so memory use stays bounded. Call close, or
+    use a with block, to remove the temporary database.
+    '''
+
+    def __init__(self, keys=DUPLICATE_KEYS, spill_after=None, spill_path=None):
+        self.keys = tuple(keys)
+        self.spill_after = spill_after
+        self.spill_path = spill_path
+        self.duplicates = []
+
+        self._index = {}
+        self._connection = None
+        self._temporary_directory = None
+
+    def check(self, batch):
+        digests = {}
+        failed = {}
+
+        for index, data in batch:
+            digests.setdefault(key_digest(data, self.keys), []).append(index)
+
+        if self._connection is None:
+            seen = self._index
+        else:
+            seen = lookup(self._connection, 'keys', 'row', digests)
+
+        new = []
+
+        for digest, indexes in digests.items():
+            first = seen.get(digest)
+
+            if first is None:
+                first = indexes[0]
+                indexes = indexes[1:]
+                new.append((digest, first))
+
+            for index in indexes:
+                self.duplicates.append((index, first))
+                failed[index] = [self._message(first)]
+
+        self._add(new)
+
+        return failed
+
+    def _message(self, first):
+        return (
+            f'Duplicate of row {first}: the same {", ".join(self.keys[:-1])} '
+            f'and {self.keys[-1]}.'
+        )
+
+    def _add(self, new):
+        if self._connection is not None:
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT INTO keys (key, row) VALUES (?, ?)', new
+                )
+            return
+
+        self._index.update(new)
+
+        if self.spill_after is not None and len(self._index) > self.spill_after:
+            self._spill()
+
+    def _spill(self):
+        path = self.spill_path
+
+        if path is None:
+            self._temporary_directory = tempfile.TemporaryDirectory()
+            path = os.path.join(self._temporary_directory.name, 'keys.sqlite')
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS keys '
+            '(key BLOB PRIMARY KEY, row INTEGER NOT NULL) WITHOUT ROWID'
+        )
+
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO keys (key, row) VALUES (?, ?)', self._index.items()
+            )
+
+        self._index = {}
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+        if self._temporary_directory is not None:
+            self._temporary_directory.cleanup()
+            self._temporary_directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class UniquenessIndex(Stage):
+    '''
+    Reject rows whose sample_id, lab_id and pcr_target were accepted in an
+    earlier submission, as recorded in a sqlite database at path.
+
+    Rows that pass are held as pending until commit, which records them as
+    accepted under the submission label in one transaction; rollback
+    discards them, e.g. when the submission is rejected. In a with block,
+    it commits if the block succeeds and rolls back if it raises, such as
+    a LoadError from load_rows. Put this stage after any others, so only
+    rows that pass every check are recorded.
+    '''
+
+    def __init__(self, path, keys=UNIQUE_KEYS, submission=None):
+        self.keys = tuple(keys)
+        self.submission = submission
+
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(
+            'CREATE TABLE IF NOT EXISTS accepted '
+            '(key BLOB PRIMARY KEY, submission TEXT) WITHOUT ROWID;'
+            'CREATE TEMP TABLE IF NOT EXISTS pending '
+            '(key BLOB PRIMARY KEY) WITHOUT ROWID;'
+        )
+
+    def check(self, batch):
+        digests = {}
+
+        for index, data in batch:
+            digests.setdefault(key_digest(data, self.keys), []).append(index)
+
+        accepted = lookup(self._connection, 'accepted', 'submission', digests)
+        failed = {}
+
+        for digest, submission in accepted.items():
+            message = self._message(submission)
+
+            for index in digests.pop(digest):
+                failed[index] = [message]
+
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO pending (key) VALUES (?)',
+                ((digest,) for digest in digests)
+            )
+
+        return failed
+
+    def _message(self, submission):
+        keys = f'{", ".join(self.keys[:-1])} and {self.keys[-1]}'
+
+        if submission is None:
+            return f'This {keys} was already accepted in an earlier submission.'
+
+        return f'This {keys} was already accepted in submission {submission}.'
+
+    def commit(self):
+        '''Record the pending rows as accepted.'''
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR IGNORE INTO accepted (key, submission) '
+                'SELECT key, ? FROM pending',
+                (self.submission,)
+            )
+            self._connection.execute('DELETE FROM pending')
+
+    def rollback(self):
+        '''Discard the pending rows.'''
+        with self._connection:
+            self._connection.execute('DELETE FROM pending')
+
+    def __len__(self):
+        '''Return the number of accepted keys.'''
+        return self._connection.execute('SELECT count(*) FROM accepted').fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+        self.close()
@@ -1,6 +1,52 @@
+import collections
 import datetime
+import functools
+import inspect
 
 
-def get_future_date(hours):
-    return (datetime.date.today() +
-            datetime.timedelta(hours=hours))
+def get_future_date(hours, today=None):
+    """Return the date hours after today, or after the given date."""
+    today = today or datetime.date.today()
+    return today + datetime.timedelta(hours=hours)
+
+
+def schema_hooks(schema, tag):
+    """Return the (attr_name, many, kwargs) hooks of a marshmallow schema,
+    or schema class, for a tag such as VALIDATES_SCHEMA, in the order
+    marshmallow runs them.
+    """
+    schema_class = schema if isinstance(schema, type) else type(schema)
+    return _class_hooks(schema_class).get(tag, ())
+
+
+@functools.lru_cache(maxsize=None)
+def _class_hooks(schema_class):
+    # Read the __marshmallow_hook__ markers the decorators set, the way
+    # SchemaMeta.resolve_hooks does, rather than the private Schema._hooks,
+    # whose layout differs between marshmallow releases.
+    hooks = collections.defaultdict(list)
+    mro = inspect.getmro(schema_class)
+
+    for attr_name in dir(schema_class):
+        for parent in mro:
+            if attr_name in parent.__dict__:
+                attr = parent.__dict__[attr_name]
+                break
+        else:
+            continue
+
+        hook_config = getattr(attr, '__marshmallow_hook__', None)
+
+        for key, config in (hook_config or {}).items():
+            if isinstance(key, tuple):
+                # Before marshmallow 3.22: {(tag, many): kwargs}.
+                tag, configs = key[0], [(key[1], config)]
+            elif isinstance(config, dict):
+                # Before marshmallow 3.22, validates: {tag: kwargs}.
+                tag, configs = key, [(False, config)]
+            else:
+                tag, configs = key, config
+
+            hooks[tag].extend((attr_name, many, kwargs) for many, kwargs in configs)
+
+    return {tag: tuple(configs) for tag, configs in hooks.items()}
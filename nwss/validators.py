@@ -4,11 +4,30 @@ from marshmallow import validate, ValidationError
 class CaseInsensitiveOneOf(validate.OneOf):
     _jsonschema_base_validator_class = validate.OneOf
 
+    def __init__(self, choices, *args, **kwargs):
+        super().__init__(choices, *args, **kwargs)
+
+        # Fold the choices once, so each value costs one hash lookup
+        # instead of a casefold per allowed value. The first spelling
+        # of a choice wins if two choices fold to the same key.
+        self.canonical_choices = {}
+        for choice in self.choices:
+            self.canonical_choices.setdefault(choice.casefold(), choice)
+
     def __call__(self, value) -> str:
         try:
-            if not any(value.casefold() == v.casefold() for v in self.choices):
+            if value.casefold() not in self.canonical_choices:
                 raise ValidationError(self._format_error(value))
         except TypeError as error:
             raise ValidationError(self._format_error(value)) from error
 
         return value
+
+    def canonical(self, value):
+        """Return the official spelling of value, or value unchanged if it
+        is not one of the choices.
+        """
+        try:
+            return self.canonical_choices.get(value.casefold(), value)
+        except (AttributeError, TypeError):
+            return value
@@ -255,6 +255,14 @@ sample_matrix = [
     'holding tank'
 ]
 
+# Liquid sample_matrix values sampled from a flowing source
+flowing_source = [
+    'raw wastewater',
+    'post grit removal',
+    'primary effluent',
+    'secondary effluent'
+]
+
 solids_separation = [
     'filtration',
     'centrifugation',
@@ -408,6 +416,14 @@ mic_chem_units = [
     'log10 micrograms/g dry sludge'
 ]
 
+# sars_cov2_units values on a per volume basis
+per_volume_result = [
+    'copies/L wastewater',
+    'log10 copies/L wastewater',
+    'micrograms/L wastewater',
+    'log10 micrograms/L wastewater'
+]
+
 other_norm_name = [
     'pepper mild mottle virus',
     'crassphage',
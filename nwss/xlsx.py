@@ -0,0 +1,105 @@
+'''
+Read lab submissions straight from Excel workbooks (pip install nwss[xlsx]).
+
+iter_rows streams a sheet with openpyxl's read-only mode, so memory use
+does not grow with the sheet, and keeps typed cells as they are: dates and
+times load as they would from their ISO strings. Numbers in text columns,
+such as a zipcode Excel stored as a number, are turned into the text a CSV
+export would have, so rows validate the same either way.
+'''
+import numbers
+
+from marshmallow import fields
+
+from nwss.schemas import WaterSampleSchema
+
+
+def iter_rows(workbook, sheet=None, schema=None):
+    '''
+    Yield the rows of a sheet as dicts keyed by its header row. workbook is
+    a path or file object; sheet is a sheet name, by default the first.
+    Empty cells are None, and empty rows are skipped. Columns are matched
+    to the fields of schema, by default a WaterSampleSchema.
+    '''
+    import openpyxl
+
+    book = openpyxl.load_workbook(workbook, read_only=True, data_only=True)
+
+    try:
+        worksheet = book[sheet] if sheet is not None else book.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+
+        if header is None:
+            return
+
+        keys = [None if key is None else str(key).strip() for key in header]
+        converters = _converters(schema or WaterSampleSchema(), keys)
+        padding = (None,) * len(keys)
+
+        for values in rows:
+            if all(value is None or value == '' for value in values):
+                continue
+
+            # Read-only sheets leave out empty cells at the end of a row.
+            values = tuple(values) + padding[len(values):]
+
+            yield {
+                key: convert(value)
+                for key, convert, value in zip(keys, converters, values)
+                if key is not None
+            }
+    finally:
+        book.close()
+
+
+def iter_load(workbook, sheet=None, schema=None):
+    '''
+    Validate the rows of a sheet with schema.iter_load, by default with a
+    WaterSampleSchema. Yields (row_index, data, errors) tuples.
+    '''
+    schema = schema or WaterSampleSchema()
+    return schema.iter_load(iter_rows(workbook, sheet=sheet, schema=schema))
+
+
+def _converters(schema, keys):
+    fields_by_key = {
+        field_obj.data_key or name: field_obj
+        for name, field_obj in schema.load_fields.items()
+    }
+
+    return [_converter(fields_by_key.get(key)) for key in keys]
+
+
+def _converter(field_obj):
+    if isinstance(field_obj, fields.String):
+        return _number_to_text
+
+    if isinstance(field_obj, fields.Integer):
+        return _float_to_integer
+
+    return _keep
+
+
+def _keep(value):
+    return value
+
+
+def _number_to_text(value):
+    if isinstance(value, bool) or not isinstance(value, numbers.Number):
+        return value
+
+    # Excel stores every number as a float; 90745.0 was typed as 90745.
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    return str(value)
+
+
+def _float_to_integer(value):
+    if isinstance(value, float):
+        # Keep fractions as text, so they fail validation instead of
+        # being truncated.
+        return int(value) if value.is_integer() else str(value)
+
+    return value
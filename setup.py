@@ -1,6 +1,12 @@
 #!/usr/bin/env python
+import re
+
 from setuptools import setup, find_packages
 
+# Read the version without importing nwss, which needs its dependencies.
+with open("nwss/__init__.py") as f:
+    version = re.search(r"^__version__ = '(.*)'$", f.read(), re.M).group(1)
+
 install_requires = [
     "marshmallow>=3.11.1",
     "marshmallow-jsonschema>=0.11.1",
@@ -8,13 +14,16 @@ install_requires = [
 ]
 
 extras_require = {
-    "dev": ["pytest>=3.6", "flake8"]
+    "dev": ["pytest>=3.6", "flake8"],
+    "columnar": ["numpy>=1.17"],
+    "xlsx": ["openpyxl>=3.0"],
+    "arrow": ["pyarrow>=4.0"],
 }
 
 
 setup(
     name="nwss",
-    version="1.0.1",
+    version=version,
     author="DataMade",
     author_email="info@datamade.us",
     license="MIT",
@@ -22,9 +31,14 @@ setup(
                 National Wastewater Surveillance System",
     url="https://github.com/datamade/nwss-data-standard",
     packages=find_packages(),
+    python_requires=">=3.7",
     include_package_data=True,
+    package_data={"nwss": ["data/*.json"]},
     install_requires=install_requires,
     extras_require=extras_require,
+    entry_points={
+        "console_scripts": ["nwss=nwss.cli:main"],
+    },
     platforms=["any"],
     keywords=[
         "National Wastewater Surveillance System",
@@ -38,7 +52,6 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
         "Development Status :: 4 - Beta",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from nwss.aio import Server, read_csv, validate_stream
+from nwss.errors import flatten_errors
+from nwss.schemas import WaterSampleSchema
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+async def collect(results):
+    return [result async for result in results]
+
+
+async def async_rows(rows, pulled=None):
+    for row in rows:
+        if pulled is not None:
+            pulled.append(row)
+        await asyncio.sleep(0)
+        yield row
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 1000])
+def test_validate_stream(valid_data, invalid_data, chunk_size):
+    rows = valid_data + invalid_data
+    expected = list(WaterSampleSchema().iter_load(rows))
+
+    stream = validate_stream(async_rows(rows), chunk_size=chunk_size)
+    results = asyncio.run(collect(stream))
+
+    assert results == expected
+
+
+def test_validate_stream_plain_iterable(valid_data):
+    results = asyncio.run(collect(validate_stream(iter(valid_data))))
+
+    assert [errors for _, _, errors in results] == [{}] * len(valid_data)
+
+
+def test_validate_stream_reads_one_chunk_ahead(valid_data):
+    rows = valid_data * 10
+    pulled = []
+
+    async def first_result():
+        stream = validate_stream(async_rows(rows, pulled), chunk_size=3)
+        result = await stream.__anext__()
+        await stream.aclose()
+        return result
+
+    index, _, _ = asyncio.run(first_result())
+
+    assert index == 0
+    assert len(pulled) <= 2 * 3 + 1
+
+
+def test_read_csv_blocks():
+    text = 'a,b\n1,"two\nlines"\r\n3,"4"\n5'
+    data = text.encode('utf-8')
+
+    async def read(block_size):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await collect(read_csv(reader, len(data), block_size=block_size))
+
+    for block_size in [1, 2, 5, 1000]:
+        assert asyncio.run(read(block_size)) == [
+            {'a': '1', 'b': 'two\nlines'},
+            {'a': '3', 'b': '4'},
+            {'a': '5', 'b': None},
+        ]
+
+
+@pytest.mark.parametrize('block_size', [7, 100, 65536])
+def test_read_csv_matches_dict_reader(valid_data, invalid_data, block_size):
+    for name, expected in [('valid_data.csv', valid_data),
+                           ('invalid_data.csv', invalid_data)]:
+        with open(os.path.join(FIXTURES, name), 'rb') as f:
+            data = f.read()
+
+        async def read():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return await collect(read_csv(reader, len(data), block_size=block_size))
+
+        assert asyncio.run(read()) == expected
+
+
+async def post(port, path, body, method='POST'):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(
+        f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n'
+        f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split()[1])
+    lines = []
+
+    # Undo the chunked transfer encoding.
+    while body:
+        size, _, body = body.partition(b'\r\n')
+        size = int(size, 16)
+        lines.extend(body[:size].decode('utf-8').splitlines())
+        body = body[size + 2:]
+
+    return status, [json.loads(line) for line in lines]
+
+
+def test_server(valid_data, invalid_data):
+    with open(os.path.join(FIXTURES, 'valid_data.csv'), 'rb') as f:
+        valid_csv = f.read()
+
+    with open(os.path.join(FIXTURES, 'invalid_data.csv'), 'rb') as f:
+        invalid_csv = f.read()
+
+    async def run():
+        server = Server(workers=2, chunk_size=2)
+        listening = await server.serve(port=0)
+        port = listening.sockets[0].getsockname()[1]
+
+        try:
+            async with listening:
+                return await asyncio.gather(
+                    post(port, '/validate', invalid_csv),
+                    post(port, '/validate', valid_csv),
+                    post(port, '/other', b''),
+                    post(port, '/validate', b'', method='GET'),
+                )
+        finally:
+            server.close()
+
+    invalid, valid, not_found, get = asyncio.run(run())
+
+    expected = [
+        error._asdict()
+        for index, _, errors in WaterSampleSchema().iter_load(invalid_data)
+        for error in flatten_errors(index, errors)
+    ]
+
+    assert invalid == (200, expected + [{
+        'rows': len(invalid_data), 'valid': 0, 'invalid': len(invalid_data)
+    }])
+    assert valid == (200, [{'rows': len(valid_data), 'valid': 3, 'invalid': 0}])
+    assert not_found == (404, [])
+    assert get == (405, [])
+
+
+@pytest.mark.parametrize('body', [
+    b'sample_id,lab_id\r\n\xff\xfe,1\r\n',
+    b'sample_id,lab_id\r\n"' + b'x' * 200000 + b'",1\r\n',
+])
+def test_server_unreadable_body(body):
+    async def run():
+        server = Server(workers=2, chunk_size=2)
+        listening = await server.serve(port=0)
+        port = listening.sockets[0].getsockname()[1]
+
+        try:
+            async with listening:
+                return await post(port, '/validate', body)
+        finally:
+            server.close()
+
+    status, lines = asyncio.run(run())
+
+    assert status == 200
+    assert len(lines) == 1
+    assert lines[0]['error'].startswith('The request body could not be read as CSV')
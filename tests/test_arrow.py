@@ -0,0 +1,79 @@
+import datetime
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from nwss import arrow, value_sets  # noqa: E402
+
+
+def with_all_columns(records):
+    # Columns missing from a record are null in the table.
+    names = arrow.arrow_schema().names
+    return [{name: record.get(name) for name in names} for record in records]
+
+
+def test_arrow_schema():
+    schema = arrow.arrow_schema()
+
+    assert schema.field('capacity_mgd').type == pa.float64()
+    assert schema.field('population_served').type == pa.int64()
+    assert schema.field('sample_collect_date').type == pa.date32()
+    assert schema.field('sample_collect_time').type == pa.time64('us')
+    assert schema.field('county_names').type == pa.list_(pa.string())
+    assert schema.field('sample_id').type == pa.string()
+    assert schema.field('reporting_jurisdiction').type == \
+        pa.dictionary(pa.int8(), pa.string())
+
+
+def test_to_table(schema, valid_data):
+    records = schema.load(valid_data)
+    table = arrow.to_table(records)
+
+    assert table.num_rows == len(records)
+    assert table.to_pylist() == with_all_columns(records)
+
+    column = table.column('sample_matrix').combine_chunks()
+    assert column.dictionary.to_pylist() == value_sets.sample_matrix
+    assert isinstance(table.column('sample_collect_date')[0].as_py(), datetime.date)
+
+
+def test_categorical_values_are_canonical(schema, valid_data):
+    records = schema.load(valid_data)
+    records[0]['reporting_jurisdiction'] = records[0]['reporting_jurisdiction'].lower()
+
+    table = arrow.to_table(records)
+
+    assert table.column('reporting_jurisdiction')[0].as_py() == \
+        records[0]['reporting_jurisdiction'].upper()
+
+
+def test_unknown_categorical_value(schema, valid_data):
+    records = schema.load(valid_data)
+    records[0]['sample_matrix'] = 'soup'
+
+    with pytest.raises(ValueError, match='sample_matrix'):
+        arrow.to_table(records)
+
+
+def test_empty_batch():
+    assert arrow.to_table([]).schema == arrow.arrow_schema()
+
+
+@pytest.mark.parametrize('format', ['parquet', 'arrow'])
+def test_writer(tmp_path, schema, valid_data, format):
+    records = schema.load(valid_data)
+    path = str(tmp_path / f'samples.{format}')
+
+    with arrow.ArrowWriter(path, format=format) as writer:
+        writer.write(records[:1])
+        writer.write(records[1:])
+
+    if format == 'parquet':
+        table = pq.read_table(path)
+    else:
+        table = pa.ipc.open_file(path).read_all()
+
+    assert table.schema == arrow.arrow_schema()
+    assert table.to_pylist() == with_all_columns(records)
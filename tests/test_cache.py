@@ -0,0 +1,146 @@
+import datetime
+import json
+
+import pytest
+from marshmallow import INCLUDE
+
+from nwss.cache import MemoryCache, RowCache, SQLiteCache
+from nwss.schemas import WaterSampleSchema
+
+
+def results(schema, rows):
+    return [(index, data, errors) for index, data, errors in schema.iter_load(rows)]
+
+
+def test_cached_results_match(schema, valid_data, invalid_data):
+    cached = WaterSampleSchema(cache=MemoryCache())
+    rows = valid_data + invalid_data
+
+    expected = results(schema, rows)
+
+    assert results(cached, rows) == expected
+    assert results(cached, rows) == expected
+
+
+def test_only_valid_rows_are_cached(valid_data, invalid_data):
+    backend = MemoryCache()
+    schema = WaterSampleSchema(cache=backend)
+
+    results(schema, valid_data + invalid_data)
+
+    assert len(backend) == len(valid_data)
+
+
+def test_cache_hits_skip_validation(monkeypatch, valid_data):
+    schema = WaterSampleSchema(cache=MemoryCache())
+    results(schema, valid_data)
+
+    def load(*args, **kwargs):
+        raise AssertionError('cached rows should not be loaded')
+
+    monkeypatch.setattr(schema, 'load', load)
+
+    assert all(not errors for _, _, errors in results(schema, valid_data))
+
+
+def test_key_ignores_order_and_empty_strings(valid_data):
+    cache = RowCache(WaterSampleSchema(), MemoryCache())
+    row = dict(valid_data[0], quality_flag='')
+    reordered = dict(reversed(list(row.items())), quality_flag=None)
+
+    assert cache.key(row) == cache.key(reordered)
+    assert cache.key(row) != cache.key(dict(row, sample_id='other'))
+
+
+def test_key_depends_on_options(valid_data):
+    backend = MemoryCache()
+    plain = RowCache(WaterSampleSchema(), backend)
+    canonical = RowCache(WaterSampleSchema(canonicalize=True), backend)
+
+    assert plain.key(valid_data[0]) != canonical.key(valid_data[0])
+
+
+def test_key_depends_on_loaded_fields(valid_data):
+    backend = MemoryCache()
+    row = {key: value for key, value in valid_data[0].items() if key != 'lab_id'}
+
+    results(WaterSampleSchema(partial=True, cache=backend), [row])
+    results(WaterSampleSchema(only=['sample_id'], cache=backend), [row])
+
+    assert results(WaterSampleSchema(cache=backend), [row]) == \
+        results(WaterSampleSchema(), [row])
+    assert results(WaterSampleSchema(partial=('lab_id',), cache=backend), [row]) == \
+        results(WaterSampleSchema(partial=('lab_id',)), [row])
+
+
+def test_cached_dates_are_checked_again(valid_data):
+    backend = MemoryCache()
+    today = WaterSampleSchema(cache=backend)
+    results(today, valid_data)
+
+    # The first fixture row has a test_result_date of 2021-04-30.
+    past = WaterSampleSchema(cache=backend, reference_date=datetime.date(2021, 4, 28))
+    errors = [errors for _, _, errors in results(past, valid_data)]
+
+    assert errors == [errors for _, _, errors in results(
+        WaterSampleSchema(reference_date=datetime.date(2021, 4, 28)), valid_data
+    )]
+    assert errors[0]
+
+
+def test_cached_values_are_json(valid_data):
+    backend = MemoryCache()
+    schema = WaterSampleSchema(cache=backend)
+    expected = results(schema, valid_data)
+
+    dates = [json.loads(value)['sample_collect_date'] for value in backend._data.values()]
+    assert '2021-04-29' in dates
+
+    assert results(schema, valid_data) == expected
+
+
+def test_cached_typed_cells(valid_data):
+    row = dict(
+        valid_data[0],
+        sample_collect_date=datetime.date(2021, 4, 29),
+        sample_collect_time=datetime.time(23, 58, 30),
+    )
+    schema = WaterSampleSchema(cache=MemoryCache())
+    expected = results(WaterSampleSchema(), [row])
+
+    assert results(schema, [row]) == expected
+    assert results(schema, [row]) == expected
+
+
+def test_rows_with_unknown_fields_are_not_cached(valid_data):
+    backend = MemoryCache()
+    schema = WaterSampleSchema(cache=backend, unknown=INCLUDE)
+    rows = [dict(row, extra=datetime.date(2021, 4, 29)) for row in valid_data]
+
+    assert results(schema, rows) == results(WaterSampleSchema(unknown=INCLUDE), rows)
+    assert len(backend) == 0
+
+
+@pytest.mark.parametrize('commit_every', [1, 1000])
+def test_sqlite_cache(tmp_path, schema, valid_data, commit_every):
+    path = str(tmp_path / 'cache.sqlite')
+    expected = results(schema, valid_data)
+
+    with SQLiteCache(path, commit_every=commit_every) as backend:
+        assert results(WaterSampleSchema(cache=backend), valid_data) == expected
+
+    with SQLiteCache(path) as backend:
+        assert len(backend) == len(valid_data)
+        assert results(WaterSampleSchema(cache=backend), valid_data) == expected
+
+
+def test_memory_cache_evicts_least_recently_used():
+    backend = MemoryCache(maxsize=2)
+    backend.set(b'a', b'1')
+    backend.set(b'b', b'2')
+    backend.get(b'a')
+    backend.set(b'c', b'3')
+
+    assert backend.get(b'b') is None
+    assert backend.get(b'a') == b'1'
+    assert len(backend) == 2
@@ -0,0 +1,90 @@
+import csv
+import gzip
+import json
+import os
+
+import pytest
+
+from nwss.cli import main
+from nwss.errors import flatten_errors
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+VALID_CSV = os.path.join(FIXTURES, 'valid_data.csv')
+INVALID_CSV = os.path.join(FIXTURES, 'invalid_data.csv')
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_validate_valid_file(tmp_path, schema, valid_data, capsys):
+    valid = str(tmp_path / 'valid.jsonl')
+
+    assert main(['validate', VALID_CSV, '--valid', valid]) == 0
+
+    out, err = capsys.readouterr()
+    assert out == ''
+    assert err == '3 rows: 3 valid, 0 with errors.\n'
+    assert read_jsonl(valid) == schema.dump(schema.load(valid_data))
+
+
+def test_validate_invalid_file(tmp_path, schema, invalid_data):
+    errors = str(tmp_path / 'errors.jsonl')
+
+    assert main(['validate', INVALID_CSV, '--errors', errors]) == 1
+
+    expected = [
+        error._asdict()
+        for index, _, row_errors in schema.iter_load(invalid_data)
+        for error in flatten_errors(index, row_errors)
+    ]
+
+    assert read_jsonl(errors) == expected
+
+
+def test_validate_gzip_csv_output(tmp_path, valid_data):
+    source = str(tmp_path / 'samples.csv.gz')
+    valid = str(tmp_path / 'valid.csv.gz')
+
+    with open(VALID_CSV, 'rb') as f, gzip.open(source, 'wb') as out:
+        out.write(f.read())
+
+    assert main(['validate', source, '--valid', valid, '--format', 'csv']) == 0
+
+    with gzip.open(valid, 'rt', newline='') as f:
+        rows = list(csv.DictReader(f))
+
+    assert [row['sample_id'] for row in rows] == [row['sample_id'] for row in valid_data]
+
+
+def test_validate_max_errors(tmp_path, capsys):
+    errors = str(tmp_path / 'errors.jsonl')
+
+    main(['validate', INVALID_CSV, '--errors', errors, '--max-errors', '2'])
+
+    assert len(read_jsonl(errors)) == 2
+    assert 'Stopped after 2 errors.' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('option', ['--chunk-size', '--workers', '--max-errors'])
+@pytest.mark.parametrize('value', ['0', '-1', 'ten'])
+def test_validate_rejects_non_positive_options(option, value, capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        main(['validate', INVALID_CSV, option, value])
+
+    assert excinfo.value.code == 2
+    assert 'must be a positive integer' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('threads', [[], ['--threads']])
+def test_validate_workers(tmp_path, threads):
+    serial = str(tmp_path / 'serial.jsonl')
+    parallel = str(tmp_path / 'parallel.jsonl')
+
+    main(['validate', INVALID_CSV, '--errors', serial])
+    main(['validate', INVALID_CSV, '--errors', parallel,
+          '--workers', '2', '--chunk-size', '1', *threads])
+
+    assert read_jsonl(serial) == read_jsonl(parallel)
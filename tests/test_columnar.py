@@ -0,0 +1,133 @@
+import datetime
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from nwss.columnar import validate_columns  # noqa: E402
+from nwss.profiling import Profile  # noqa: E402
+from nwss.schemas import WaterSampleSchema  # noqa: E402
+
+
+def to_columns(rows):
+    return {key: np.array([row[key] for row in rows], dtype=object) for key in rows[0]}
+
+
+def row_errors(schema, rows):
+    return {
+        index: errors
+        for index, _, errors in schema.iter_load(rows)
+        if errors
+    }
+
+
+def test_valid_columns(schema, valid_data):
+    result = validate_columns(to_columns(valid_data))
+
+    assert result.valid.all()
+    assert result.to_messages() == {}
+    assert result.values['capacity_mgd'].tolist() == [
+        row['capacity_mgd'] for row in schema.load(valid_data)
+    ]
+
+
+def test_invalid_columns(schema, invalid_data):
+    result = validate_columns(to_columns(invalid_data))
+
+    assert result.to_messages() == row_errors(schema, invalid_data)
+
+
+def test_to_report(invalid_data):
+    result = validate_columns(to_columns(invalid_data))
+    report = result.to_report()
+
+    assert report.to_messages() == result.to_messages()
+    assert len(report.messages) == len(result.messages)
+
+
+@pytest.mark.parametrize(
+    'input',
+    [
+        {'reporting_jurisdiction': 'ca'},
+        {'reporting_jurisdiction': 'CAA'},
+        {'county_names': '', 'other_jurisdiction': ''},
+        {'sample_location': 'upstream', 'sample_location_specify': ''},
+        {'pretreatment': 'YES', 'pretreatment_specify': ''},
+        {'sample_matrix': 'Raw Wastewater', 'flow_rate': ''},
+        {'zipcode': '1234'},
+        {'population_served': '-1'},
+        {'population_served': '1.5e3'},
+        {'epaid': 'not an epaid'},
+        {'sample_id': 'has spaces'},
+        {'rec_eff_percent': '5', 'rec_eff_spike_conc': ''},
+        {'rec_eff_percent': '5', 'rec_eff_spike_conc': '0'},
+        {'hum_frac_mic_unit': ''},
+        {'inhibition_detect': 'not tested'},
+        {'inhibition_detect': 'yes', 'inhibition_adjust': ''},
+        {'sample_collect_date': '3000-01-01'},
+        {'test_result_date': '2021-01-01'},
+        {'sample_collect_time': '25:00'},
+        {'flow_rate': ''},
+        {'flow_rate': '0'},
+        {'capacity_mgd': 'lots'},
+        {'capacity_mgd': 'inf'},
+        {'wwtp_name': ''},
+    ]
+)
+def test_columns_match_schema(schema, valid_data, input):
+    valid_data[1].update(input)
+
+    result = validate_columns(to_columns(valid_data))
+
+    assert result.to_messages() == row_errors(schema, valid_data)
+
+
+def test_unknown_column(schema, valid_data):
+    for row in valid_data:
+        row['unexpected_column'] = 'value'
+
+    result = validate_columns(to_columns(valid_data))
+
+    assert result.to_messages() == row_errors(schema, valid_data)
+
+
+def test_typed_columns(schema, valid_data):
+    columns = to_columns(valid_data)
+    columns['capacity_mgd'] = np.array([160.0, -1.0, np.nan])
+    columns['population_served'] = np.array([3500000, 100, 7], dtype=np.int64)
+    columns['sample_collect_date'] = np.array(
+        ['2021-05-30', '2021-04-28', '2021-04-28'], dtype='datetime64[D]'
+    )
+
+    result = validate_columns(columns)
+
+    assert result.to_messages() == {
+        0: {'_schema': ["'test_result_date' cannot be before 'sample_collect_date'."]},
+        1: {'capacity_mgd': ['Must be greater than or equal to 0.']},
+        2: {'capacity_mgd': ['Field may not be null.']},
+    }
+    assert result.values['population_served'].tolist() == [3500000, 100, 7]
+    assert result.values['sample_collect_date'][1] == datetime.date(2021, 4, 28)
+
+
+def test_arrow_table(schema, valid_data):
+    pa = pytest.importorskip('pyarrow')
+
+    table = pa.Table.from_pylist(valid_data)
+    table = table.set_column(
+        table.column_names.index('flow_rate'),
+        'flow_rate',
+        pa.array([1000.0, None, 12.5])
+    )
+
+    result = validate_columns(table)
+
+    assert result.to_messages() == {1: {'_schema': [
+        row_errors(schema, [dict(valid_data[1], flow_rate='')])[0]['_schema'][0]
+    ]}}
+
+
+def test_profiled_schema(valid_data):
+    schema = WaterSampleSchema(profile=Profile())
+
+    assert validate_columns(to_columns(valid_data), schema=schema).valid.all()
@@ -0,0 +1,82 @@
+from marshmallow import ValidationError
+import pytest
+
+from nwss.compiler import compile_schema
+import nwss.schemas
+from nwss.schemas import WaterSampleSchema
+
+
+def load(load_function, data, **kwargs):
+    try:
+        return load_function(data, **kwargs), None
+    except ValidationError as e:
+        return e.valid_data, e.messages
+
+
+@pytest.fixture
+def compiled(schema):
+    return compile_schema(schema)
+
+
+def test_compiled_valid_data(schema, compiled, valid_data):
+    assert load(compiled.load, valid_data) == load(schema.load, valid_data)
+
+
+def test_compiled_invalid_data(schema, compiled, invalid_data):
+    expected = load(schema.load, invalid_data)
+
+    assert expected[1]
+    assert load(compiled.load, invalid_data) == expected
+
+
+def test_compiled_single_rows(schema, compiled, valid_data, invalid_data):
+    for row in valid_data + invalid_data:
+        assert load(compiled.load, row, many=False) == \
+            load(schema.load, row, many=False)
+
+
+@pytest.mark.parametrize(
+    'input',
+    [
+        {'reporting_jurisdiction': 'ca'},
+        {'county_names': '', 'other_jurisdiction': ''},
+        {'sample_location': 'upstream', 'sample_location_specify': ''},
+        {'zipcode': '1234'},
+        {'population_served': '-1'},
+        {'epaid': 'not an epaid'},
+        {'rec_eff_percent': '5', 'rec_eff_spike_conc': ''},
+        {'inhibition_detect': 'not tested'},
+        {'sample_collect_date': '3000-01-01'},
+        {'test_result_date': '2021-01-01'},
+        {'sample_collect_time': '25:00'},
+        {'flow_rate': ''},
+        {'capacity_mgd': 'lots'},
+        {'unexpected_column': 'value'},
+    ]
+)
+def test_compiled_matches_schema(schema, compiled, valid_data, input):
+    valid_data[1].update(input)
+
+    assert load(compiled.load, valid_data) == load(schema.load, valid_data)
+
+
+def test_canonicalizing_schema(valid_data):
+    schema = WaterSampleSchema(many=True, canonicalize=True)
+    valid_data[0]['reporting_jurisdiction'] = 'ca'
+
+    assert load(compile_schema(schema).load, valid_data) == \
+        load(schema.load, valid_data)
+
+
+def test_compiled_clock_read_once_per_load(monkeypatch, compiled, valid_data):
+    calls = []
+    original = nwss.schemas.get_future_date
+
+    def counting_get_future_date(*args):
+        calls.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(nwss.schemas, 'get_future_date', counting_get_future_date)
+
+    compiled.load(valid_data * 10)
+    assert len(calls) == 1
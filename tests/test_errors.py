@@ -0,0 +1,108 @@
+import json
+
+from marshmallow import ValidationError
+import pytest
+
+import nwss.schemas
+from nwss.errors import ErrorReport, LoadError, RowError, flatten_errors
+
+
+def test_flatten_errors():
+    messages = {
+        'zipcode': ['Not a valid zipcode.', 'Too short.'],
+        '_schema': ['Bad row.'],
+        'county_names': {0: ['Not a valid string.']},
+    }
+
+    assert list(flatten_errors(4, messages)) == [
+        RowError(4, 'zipcode', 'Not a valid zipcode.'),
+        RowError(4, 'zipcode', 'Too short.'),
+        RowError(4, '_schema', 'Bad row.'),
+        RowError(4, 'county_names.0', 'Not a valid string.'),
+    ]
+
+
+def test_load_rows_valid(schema, valid_data):
+    assert schema.load_rows(valid_data) == schema.load(valid_data)
+
+
+def test_load_rows_collects_all_errors(schema, invalid_data):
+    results = list(schema.iter_load(invalid_data))
+
+    with pytest.raises(LoadError) as e:
+        schema.load_rows(invalid_data)
+
+    expected = [
+        error
+        for index, _, errors in results
+        for error in flatten_errors(index, errors)
+    ]
+
+    assert e.value.complete
+    assert e.value.errors == expected
+    assert len(e.value.valid_data) == len(invalid_data)
+
+
+def test_load_rows_max_errors(schema, invalid_data):
+    with pytest.raises(LoadError) as e:
+        schema.load_rows(invalid_data, max_errors=2)
+
+    assert not e.value.complete
+    assert len(e.value.errors) == 2
+    assert all(isinstance(error, RowError) for error in e.value.errors)
+
+
+def test_load_rows_fail_fast(schema, invalid_data):
+    rows = iter(invalid_data)
+
+    with pytest.raises(LoadError) as e:
+        schema.load_rows(rows, fail_fast=True)
+
+    first_bad_row = e.value.errors[0].row
+
+    assert not e.value.complete
+    assert {error.row for error in e.value.errors} == {first_bad_row}
+    assert list(e.value.messages) == [first_bad_row]
+    # Rows after the first bad one are not read.
+    assert len(list(rows)) == len(invalid_data) - first_bad_row - 1
+    # Stopping early does not leave the batch's reference date behind.
+    assert id(schema) not in nwss.schemas._batch_dates.get()
+
+
+def test_error_report(schema, invalid_data):
+    with pytest.raises(ValidationError) as e:
+        schema.load(invalid_data)
+
+    report = ErrorReport.from_messages(e.value.messages)
+
+    assert report.to_messages() == e.value.messages
+    assert len(report) == sum(
+        len(messages)
+        for row in e.value.messages.values()
+        for messages in row.values()
+    )
+
+
+def test_error_report_interns_messages():
+    message = 'Must be one of: ' + ', '.join(str(i) for i in range(100)) + '.'
+    report = ErrorReport(
+        RowError(row, 'reporting_jurisdiction', message) for row in range(1000)
+    )
+
+    assert report.messages == [message]
+    assert report.fields == ['reporting_jurisdiction']
+    assert list(report)[999] == RowError(999, 'reporting_jurisdiction', message)
+
+    payload = json.dumps(report.to_dict())
+    nested = json.dumps(report.to_messages())
+
+    assert len(payload) * 20 < len(nested)
+    restored = ErrorReport.from_dict(json.loads(payload))
+    assert restored.to_messages() == report.to_messages()
+
+
+def test_load_error_report(schema, invalid_data):
+    with pytest.raises(LoadError) as e:
+        schema.load_rows(invalid_data)
+
+    assert list(e.value.report()) == e.value.errors
@@ -0,0 +1,99 @@
+import datetime
+import os
+
+from marshmallow import ValidationError
+import pytest
+
+import nwss.schemas
+from nwss.cache import MemoryCache
+from nwss.parallel import chunked, iter_load_parallel, load_parallel
+from nwss.profiling import Profile
+from nwss.schemas import WaterSampleSchema
+from nwss.stages import DuplicateCheck, UniquenessIndex
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [(0, [0, 1]), (2, [2, 3]), (4, [4])]
+
+
+def test_load_parallel(schema, valid_data):
+    assert load_parallel(valid_data, chunk_size=2, max_workers=2) == \
+        schema.load(valid_data)
+
+
+def test_load_parallel_errors(schema, invalid_data):
+    with pytest.raises(ValidationError) as e:
+        load_parallel(invalid_data, chunk_size=3, max_workers=2)
+
+    expected = {
+        index: errors
+        for index, _, errors in schema.iter_load(invalid_data)
+        if errors
+    }
+
+    assert e.value.messages == expected
+
+
+def test_iter_load_parallel_order(valid_data):
+    rows = valid_data * 10
+
+    results = list(iter_load_parallel(rows, chunk_size=4, max_workers=2))
+
+    assert [index for index, _, _ in results] == list(range(len(rows)))
+
+
+def test_iter_load_parallel_stages_across_chunks(valid_data):
+    rows = valid_data * 2
+    expected = DuplicateCheck()
+    list(WaterSampleSchema(stages=[expected]).iter_load(rows))
+
+    check = DuplicateCheck()
+    results = list(iter_load_parallel(
+        rows, chunk_size=3, max_workers=2, stages=[check]
+    ))
+
+    assert [index for index, _, errors in results if errors] == [3, 4, 5]
+    assert sorted(check.duplicates) == sorted(expected.duplicates)
+
+
+def test_iter_load_parallel_uniqueness_index(tmp_path, valid_data):
+    path = str(tmp_path / 'accepted.sqlite')
+
+    with UniquenessIndex(path, submission='2021-05-01') as index:
+        list(iter_load_parallel(valid_data, chunk_size=1, stages=[index]))
+
+    with UniquenessIndex(path) as index:
+        assert len(index) == len(valid_data)
+
+
+def test_iter_load_parallel_reads_the_clock_once(monkeypatch, valid_data):
+    parent = os.getpid()
+    get_future_date = nwss.schemas.get_future_date
+
+    def clock_in_parent_only(hours, today=None):
+        # Forked workers inherit this, and would fail every row.
+        if os.getpid() != parent:
+            return datetime.date(2000, 1, 1)
+        return get_future_date(hours, today)
+
+    monkeypatch.setattr(nwss.schemas, 'get_future_date', clock_in_parent_only)
+
+    results = list(iter_load_parallel(valid_data * 2, chunk_size=2, max_workers=2))
+
+    assert not any(errors for _, _, errors in results)
+
+
+@pytest.mark.parametrize('option', ['cache', 'profile'])
+def test_iter_load_parallel_rejects_per_process_state(valid_data, option):
+    value = {'cache': MemoryCache, 'profile': Profile}[option]()
+
+    with pytest.raises(ValueError, match=option):
+        list(iter_load_parallel(valid_data, **{option: value}))
+
+    list(iter_load_parallel(valid_data, threads=True, **{option: value}))
+
+    if option == 'profile':
+        report = {timing.name: timing for timing in value.report()}
+        assert report['sample_id'].calls == len(valid_data)
+    else:
+        assert len(value) == len(valid_data)
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from marshmallow import ValidationError
+
+from nwss.compiler import compile_schema
+from nwss.profiling import FIELD, FIELD_VALIDATOR, SCHEMA_VALIDATOR, Profile
+from nwss.rules import schema_rules
+from nwss.schemas import WaterSampleSchema
+
+
+def test_profile_counts_calls(valid_data):
+    profile = Profile()
+    schema = WaterSampleSchema(many=True, profile=profile)
+
+    schema.load(valid_data)
+    report = {timing.name: timing for timing in profile.report()}
+
+    assert report['sample_id'].kind == FIELD
+    assert report['sample_id'].calls == len(valid_data)
+    assert report['sample_id'].failures == 0
+    assert report['validate_sample_collect_date'].kind == FIELD_VALIDATOR
+    assert report['validate_sample_collect_date'].calls == len(valid_data)
+    assert report['validate_flow_rate'].kind == SCHEMA_VALIDATOR
+    assert report['validate_flow_rate'].calls == len(valid_data)
+    assert report['validate_county_jurisdiction'].calls == len(valid_data)
+    assert all(timing.seconds >= 0 for timing in report.values())
+
+
+def test_profile_counts_failures(valid_data):
+    profile = Profile()
+    schema = WaterSampleSchema(profile=profile)
+
+    rows = [dict(row, sample_id='not valid!') for row in valid_data]
+
+    with pytest.raises(ValidationError):
+        schema.load(rows, many=True)
+
+    report = {timing.name: timing for timing in profile.report()}
+    assert report['sample_id'].failures == len(valid_data)
+    assert report['lab_id'].failures == 0
+
+
+def test_profile_schema_validator_failures(valid_data):
+    profile = Profile()
+    schema = WaterSampleSchema(profile=profile)
+
+    rows = [dict(valid_data[0], inhibition_detect='not tested')]
+
+    with pytest.raises(ValidationError):
+        schema.load(rows, many=True)
+
+    report = {timing.name: timing for timing in profile.report()}
+    assert report['validate_inhibition_not_tested'].failures == 1
+    assert report['validate_inhibition_detect'].failures == 0
+
+
+def test_profile_callback(valid_data):
+    calls = []
+    profile = Profile(callback=lambda *args: calls.append(args))
+    WaterSampleSchema(many=True, profile=profile).load(valid_data)
+
+    assert len(calls) == sum(timing.calls for timing in profile.report())
+    name, kind, seconds, failed = calls[0]
+    assert isinstance(seconds, float)
+    assert failed is False
+
+
+def test_profile_report(valid_data):
+    profile = Profile()
+    WaterSampleSchema(many=True, profile=profile).load(valid_data)
+
+    report = profile.report()
+    seconds = [timing.seconds for timing in report]
+    assert seconds == sorted(seconds, reverse=True)
+
+    as_dict = json.loads(json.dumps(profile.to_dict()))
+    assert as_dict['sample_id']['calls'] == len(valid_data)
+    assert set(as_dict['sample_id']) == {'kind', 'calls', 'seconds', 'failures'}
+
+    profile.reset()
+    assert profile.report() == []
+
+
+def test_profile_only_affects_its_instance(valid_data):
+    profiled = WaterSampleSchema(many=True, profile=Profile())
+    plain = WaterSampleSchema(many=True)
+
+    assert 'deserialize' not in vars(plain.fields['sample_id'])
+    assert 'validate_flow_rate' not in vars(plain)
+    assert plain.load(valid_data) == profiled.load(valid_data)
+
+
+def test_profiled_schema_keeps_rules():
+    schema = WaterSampleSchema(profile=Profile())
+
+    assert schema_rules(schema) == schema_rules(WaterSampleSchema)
+
+
+def test_compile_rejects_profiled_schema():
+    with pytest.raises(ValueError, match='Profile'):
+        compile_schema(WaterSampleSchema(many=True, profile=Profile()))
@@ -1,9 +1,23 @@
 from contextlib import contextmanager
+import copy
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import json
+import os
+import pickle
 from marshmallow import ValidationError
 import pytest
 import jsonschema
 
-from nwss.utils import get_future_date
+from nwss.dump_to_jsonschema import (
+    ARTIFACT_PATH, get_schema, get_validator, load_schema
+)
+import nwss
+import nwss.dump_to_jsonschema
+import nwss.schemas
+from nwss import rules
+from nwss.schemas import WaterSampleSchema
+from nwss.utils import get_future_date, schema_hooks
 
 
 def test_valid_data(schema, valid_data):
@@ -26,6 +40,94 @@ def update_data(input, valid_data):
     return [data]
 
 
+def test_json_schema_is_built_once(json_schema):
+    assert get_schema() is get_schema()
+    assert get_schema() == json_schema
+
+
+def test_json_schema_artifact_is_loaded(monkeypatch):
+    with open(ARTIFACT_PATH) as f:
+        artifact = json.load(f)
+
+    # CI checks the schema itself is current by regenerating the file.
+    assert artifact['cdc_version'] == nwss.CDC_VERSION
+    assert artifact['version'] == nwss.__version__
+
+    def build():
+        raise AssertionError('the artifact should be used')
+
+    monkeypatch.setattr(nwss.dump_to_jsonschema, 'get_schema', build)
+    load_schema.cache_clear()
+
+    try:
+        assert load_schema() == artifact['schema']
+    finally:
+        load_schema.cache_clear()
+
+
+def test_stale_json_schema_artifact_is_not_rewritten(monkeypatch, tmp_path):
+    stale = {'cdc_version': nwss.CDC_VERSION, 'version': '0.0.0', 'schema': {}}
+    path = tmp_path / 'jsonschema.json'
+    path.write_text(json.dumps(stale))
+    monkeypatch.setattr(nwss.dump_to_jsonschema, 'ARTIFACT_PATH', str(path))
+    load_schema.cache_clear()
+
+    try:
+        assert load_schema() is get_schema()
+    finally:
+        load_schema.cache_clear()
+
+    assert json.loads(path.read_text()) == stale
+
+
+def test_json_schema_rules(json_schema):
+    definition = json_schema['definitions']['WaterSampleSchema']
+    properties = definition['properties']
+    schema_rules = rules.schema_rules(WaterSampleSchema)
+
+    assert definition['allOf'] == [
+        rule.to_jsonschema(properties) for _, rule in schema_rules
+    ]
+
+
+def test_docs_json_schema_is_current(json_schema):
+    path = os.path.join(os.path.dirname(__file__), '..', 'docs', 'js', 'schema.json')
+
+    with open(path) as f:
+        docs_schema = json.load(f)
+
+    # If this fails, run: python -m nwss.dump_to_jsonschema > docs/js/schema.json
+    definition = docs_schema['definitions']['WaterSampleSchema']
+    assert definition['allOf'] == json_schema['definitions']['WaterSampleSchema']['allOf']
+    assert definition['properties'].keys() == \
+        json_schema['definitions']['WaterSampleSchema']['properties'].keys()
+
+
+def test_schema_hooks_reads_both_hook_layouts():
+    class Hooks():
+        def old_rule(self):
+            pass
+
+        def old_validator(self):
+            pass
+
+        def new_rule(self):
+            pass
+
+        # marshmallow before 3.22, and after.
+        old_rule.__marshmallow_hook__ = {('validates_schema', True): {'a': 1}}
+        old_validator.__marshmallow_hook__ = {'validates': {'field_name': 'x'}}
+        new_rule.__marshmallow_hook__ = {'validates_schema': [(False, {'b': 2})]}
+
+    assert schema_hooks(Hooks, 'validates_schema') == (
+        ('new_rule', False, {'b': 2}), ('old_rule', True, {'a': 1})
+    )
+    assert schema_hooks(Hooks(), 'validates') == (
+        ('old_validator', False, {'field_name': 'x'}),
+    )
+    assert schema_hooks(Hooks, 'post_load') == ()
+
+
 def test_valid_json_schema(valid_json, json_schema):
     # should not raise an exception
     jsonschema.validate(instance=valid_json, schema=json_schema)
@@ -101,6 +203,32 @@ def test_invalid_json_schema(valid_json, json_schema, input, expect):
         jsonschema.validate(instance=data, schema=json_schema)
 
 
+@pytest.mark.parametrize(
+    'input,valid',
+    [
+        ({'reporting_jurisdiction': 'CA'}, True),
+        ({'reporting_jurisdiction': 'ca'}, True),
+        ({'sample_matrix': 'Raw Wastewater'}, True),
+        ({'reporting_jurisdiction': 'CAA'}, False),
+        ({'sample_collect_date': '2021-13-45'}, False),
+        ({'pretreatment': 'yes', 'pretreatment_specify': None}, False),
+        ({'pretreatment': 'YES', 'pretreatment_specify': None}, False),
+        ({'inhibition_detect': 'not tested', 'inhibition_method': 'none'}, True),
+        ({'inhibition_detect': 'NOT TESTED', 'inhibition_method': 'NONE'}, False),
+        ({'rec_eff_percent': -1, 'rec_eff_target_name': None}, True),
+        ({'rec_eff_percent': 50, 'rec_eff_target_name': None}, False),
+        ({'hum_frac_mic_conc': 0, 'hum_frac_mic_unit': None}, True),
+        ({'hum_frac_mic_conc': 5, 'hum_frac_mic_unit': None}, False),
+    ]
+)
+def test_json_schema_validator(valid_json, input, valid):
+    validator = get_validator()
+    data = update_data(input, valid_json)
+
+    assert validator is get_validator()
+    assert validator.is_valid(data) == valid
+
+
 @pytest.mark.parametrize(
     'input,expect,error',
     [
@@ -799,6 +927,14 @@ def test_pretreatment(schema, valid_data, input, expect, error):
             },
             pytest.raises(ValidationError),
             'If "pretreatment" is "yes", then specify the chemicals used.'
+        ),
+        (
+            {
+                'pretreatment': 'YES',
+                'pretreatment_specify': None
+            },
+            pytest.raises(ValidationError),
+            'If "pretreatment" is "yes", then specify the chemicals used.'
         )
     ]
 )
@@ -1722,6 +1858,16 @@ def test_quant_stan_type(schema, valid_data, input, expect, error):
             "'inhibition_method' must be 'none' "
             "if inhibition_detect == 'not tested'."
         ),
+        (
+            {
+                'inhibition_detect': 'Not Tested',
+                'inhibition_adjust': 'no',
+                'inhibition_method': 'NONE'
+            },
+            pytest.raises(ValidationError),
+            "'inhibition_method' must be 'none' "
+            "if inhibition_detect == 'not tested'."
+        ),
         (
             {
                 'inhibition_detect': 'n',
@@ -2265,3 +2411,185 @@ def test_quality_flag(schema, valid_data, input, expect, error):
 
     if e:
         assert error in str(e.value)
+
+
+@pytest.mark.parametrize(
+    'input,expect,error',
+    [
+        (
+            {
+                'reporting_jurisdiction': 'ca',
+                'sample_matrix': 'Raw Wastewater',
+                'pretreatment': 'YES'
+            },
+            does_not_raise(),
+            None
+        ),
+        (
+            {
+                'pretreatment': 'YES',
+                'pretreatment_specify': ''
+            },
+            pytest.raises(ValidationError),
+            'If "pretreatment" is "yes", then specify the chemicals used.'
+        )
+    ]
+)
+def test_canonicalize(valid_data, input, expect, error):
+    schema = WaterSampleSchema(many=True, canonicalize=True)
+    data = update_data(input, valid_data)
+
+    with expect as e:
+        result, = schema.load(data)
+
+    if e:
+        assert error in str(e.value)
+    else:
+        assert result['reporting_jurisdiction'] == 'CA'
+        assert result['sample_matrix'] == 'raw wastewater'
+        assert result['pretreatment'] == 'yes'
+
+
+def test_canonicalize_off_by_default(schema, valid_data):
+    data = update_data({'reporting_jurisdiction': 'ca'}, valid_data)
+
+    result, = schema.load(data)
+
+    assert result['reporting_jurisdiction'] == 'ca'
+
+
+def test_iter_load(schema, valid_data, invalid_data):
+    for index, data, errors in schema.iter_load(iter(valid_data)):
+        assert not errors
+        assert data['sample_id'] == valid_data[index]['sample_id']
+
+    results = list(schema.iter_load(invalid_data))
+
+    with pytest.raises(ValidationError) as e:
+        schema.load(invalid_data)
+
+    assert [index for index, _, errors in results if errors] == list(e.value.messages)
+
+    for index, _, errors in results:
+        for field, messages in errors.items():
+            assert e.value.messages[index][field] == messages
+
+
+def test_reference_date(valid_data):
+    schema = WaterSampleSchema(many=True, reference_date=datetime.date(2021, 4, 28))
+
+    assert schema.latest_date() == datetime.date(2021, 4, 29)
+
+    with pytest.raises(ValidationError) as e:
+        schema.load(valid_data)
+
+    # Only the row whose test_result_date is 2021-04-30 is too late.
+    assert list(e.value.messages) == [0]
+    assert "'test_result_date' cannot be after" in str(e.value)
+
+    errors = [errors for _, _, errors in schema.iter_load(valid_data)]
+
+    assert [bool(e) for e in errors] == [True, False, False]
+
+
+def test_clock_read_once_per_batch(monkeypatch, schema, valid_data):
+    calls = []
+    original = nwss.schemas.get_future_date
+
+    def counting_get_future_date(*args):
+        calls.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(nwss.schemas, 'get_future_date', counting_get_future_date)
+
+    schema.load(valid_data)
+    assert len(calls) == 1
+
+    list(schema.iter_load(valid_data))
+    assert len(calls) == 2
+
+
+def test_schema_can_be_copied_and_pickled(valid_data):
+    schema = WaterSampleSchema(many=True, reference_date=datetime.date(2021, 5, 1))
+
+    copied = copy.deepcopy(schema)
+    assert copied.latest_date() == schema.latest_date()
+    assert copied.load(valid_data) == schema.load(valid_data)
+
+    # Optional fields come back as a copy of marshmallow's missing
+    # sentinel, so only check that rows still load.
+    unpickled = pickle.loads(pickle.dumps(schema))
+    assert unpickled.latest_date() == schema.latest_date()
+    unpickled.load(valid_data)
+
+
+def test_cast_to_none(valid_data):
+    row = dict(valid_data[0], pretreatment_specify='')
+    copying = WaterSampleSchema()
+    in_place = WaterSampleSchema(normalize_in_place=True)
+
+    cast = copying.cast_to_none(row)
+    assert cast['pretreatment_specify'] is None
+    assert row['pretreatment_specify'] == ''
+
+    assert in_place.cast_to_none(row) is row
+    assert row['pretreatment_specify'] is None
+
+    # Rows without empty strings are never copied.
+    assert copying.cast_to_none(row) is row
+
+
+def test_normalize_in_place(valid_data):
+    rows = [dict(row, quality_flag='') for row in valid_data]
+    expected = WaterSampleSchema(many=True).load(rows)
+    schema = WaterSampleSchema(many=True, normalize_in_place=True)
+
+    assert schema.load(rows) == expected
+    assert all(row['quality_flag'] is None for row in rows)
+
+
+def test_native_dates_and_times(schema, valid_data):
+    rows = [
+        dict(
+            row,
+            sample_collect_date=datetime.date.fromisoformat(row['sample_collect_date']),
+            test_result_date=datetime.datetime.fromisoformat(row['test_result_date']),
+            sample_collect_time=datetime.time.fromisoformat(row['sample_collect_time']),
+        )
+        for row in valid_data
+    ]
+
+    assert schema.load(rows) == schema.load(valid_data)
+
+
+def test_shared_schema(valid_data):
+    schema = nwss.schemas.shared_schema(many=True)
+
+    assert schema is nwss.schemas.shared_schema(many=True)
+    assert schema is not nwss.schemas.shared_schema()
+    assert schema.many
+    assert schema.load(valid_data) == WaterSampleSchema(many=True).load(valid_data)
+
+
+def test_shared_schema_options(valid_data):
+    partial = nwss.schemas.shared_schema(partial=['lab_id', 'sample_id'])
+
+    assert partial is nwss.schemas.shared_schema(partial=('sample_id', 'lab_id'))
+    assert partial.partial == ('lab_id', 'sample_id')
+
+    row = dict(valid_data[0], reporting_jurisdiction='ca')
+    del row['lab_id']
+    assert partial.load(row)['reporting_jurisdiction'] == 'ca'
+
+    canonical = nwss.schemas.shared_schema(canonicalize=True, unknown='exclude')
+    assert canonical.load(row, partial=True)['reporting_jurisdiction'] == 'CA'
+    assert canonical.unknown == 'exclude'
+
+
+def test_shared_schema_threads():
+    with ThreadPoolExecutor(8) as executor:
+        schemas = list(executor.map(
+            lambda _: nwss.schemas.shared_schema(unknown='raise'), range(100)
+        ))
+
+    assert all(schema is schemas[0] for schema in schemas)
@@ -0,0 +1,188 @@
+import pytest
+
+from nwss.errors import LoadError
+from nwss.schemas import WaterSampleSchema
+from nwss.stages import DuplicateCheck, Stage, UniquenessIndex
+
+
+def with_duplicates(valid_data, n=50):
+    rows = []
+
+    for i in range(n):
+        rows.append(dict(valid_data[i % len(valid_data)], sample_id=f'sample-{i % 10}'))
+
+    return rows
+
+
+def expected_duplicates(rows):
+    first = {}
+    duplicates = []
+
+    for index, row in enumerate(rows):
+        key = (
+            row['sample_id'], row['lab_id'], row['pcr_target'], row['sample_collect_date']
+        )
+
+        if key in first:
+            duplicates.append((index, first[key]))
+        else:
+            first[key] = index
+
+    return duplicates
+
+
+@pytest.mark.parametrize('batch_size', [1, 7, 1000])
+def test_duplicate_check(valid_data, batch_size):
+    rows = with_duplicates(valid_data)
+    check = DuplicateCheck()
+    schema = WaterSampleSchema(stages=[check], batch_size=batch_size)
+
+    results = list(schema.iter_load(rows))
+    expected = expected_duplicates(rows)
+
+    assert expected
+    assert check.duplicates == expected
+    assert [index for index, _, errors in results if errors] == [i for i, _ in expected]
+
+    index, first = expected[0]
+    assert results[index][2] == {'_schema': [
+        f'Duplicate of row {first}: the same sample_id, lab_id, '
+        'pcr_target and sample_collect_date.'
+    ]}
+
+
+@pytest.mark.parametrize('spill_path', [None, 'keys.sqlite'])
+def test_duplicate_check_spills_to_disk(tmp_path, valid_data, spill_path):
+    rows = with_duplicates(valid_data)
+    path = spill_path and str(tmp_path / spill_path)
+
+    with DuplicateCheck(spill_after=5, spill_path=path) as check:
+        schema = WaterSampleSchema(stages=[check], batch_size=4)
+        list(schema.iter_load(rows))
+
+        assert check._connection is not None
+        assert check.duplicates == expected_duplicates(rows) != []
+
+
+def test_duplicate_keys_ignore_case(valid_data):
+    rows = [
+        valid_data[0],
+        dict(valid_data[0], pcr_target=valid_data[0]['pcr_target'].upper()),
+    ]
+    check = DuplicateCheck()
+
+    list(WaterSampleSchema(stages=[check]).iter_load(rows))
+
+    assert check.duplicates == [(1, 0)]
+
+
+def test_duplicate_keys_match_ids_exactly(valid_data):
+    rows = [
+        dict(valid_data[0], sample_id='abc'),
+        dict(valid_data[0], sample_id='ABC'),
+        dict(valid_data[0], lab_id=valid_data[0]['lab_id'].swapcase()),
+    ]
+    check = DuplicateCheck()
+
+    list(WaterSampleSchema(stages=[check]).iter_load(rows))
+
+    assert check.duplicates == []
+
+
+def test_stages_only_see_valid_rows(valid_data, invalid_data):
+    class Recorder(Stage):
+        def __init__(self):
+            self.seen = []
+
+        def check(self, batch):
+            self.seen += [index for index, _ in batch]
+            return {}
+
+    recorder = Recorder()
+    rows = valid_data + invalid_data
+    schema = WaterSampleSchema(stages=[recorder])
+
+    assert recorder.seen == []
+    results = list(schema.iter_load(rows))
+
+    assert recorder.seen == [index for index, _, errors in results if not errors]
+
+
+def test_uniqueness_index(tmp_path, valid_data):
+    path = str(tmp_path / 'accepted.sqlite')
+
+    with UniquenessIndex(path, submission='2021-05-01') as index:
+        schema = WaterSampleSchema(stages=[index])
+        assert all(not errors for _, _, errors in schema.iter_load(valid_data))
+
+    with UniquenessIndex(path) as index:
+        assert len(index) == len(valid_data)
+
+        new = dict(valid_data[0], sample_id='new-sample')
+        schema = WaterSampleSchema(stages=[index])
+        results = list(schema.iter_load([new] + valid_data))
+
+    assert not results[0][2]
+    assert results[1][2] == {'_schema': [
+        'This sample_id, lab_id and pcr_target was already accepted '
+        'in submission 2021-05-01.'
+    ]}
+    assert all(errors for _, _, errors in results[1:])
+
+    with UniquenessIndex(path) as index:
+        assert len(index) == len(valid_data) + 1
+
+
+def test_uniqueness_index_matches_ids_exactly(tmp_path, valid_data):
+    path = str(tmp_path / 'accepted.sqlite')
+    first = dict(valid_data[0], sample_id='abc')
+
+    with UniquenessIndex(path) as index:
+        WaterSampleSchema(stages=[index]).load_rows([first])
+
+    rows = [
+        dict(first, sample_id='ABC'),
+        dict(first, pcr_target=first['pcr_target'].upper()),
+    ]
+
+    with UniquenessIndex(path) as index:
+        results = list(WaterSampleSchema(stages=[index]).iter_load(rows))
+
+    assert not results[0][2]
+    assert results[1][2]
+
+
+def test_uniqueness_index_rolls_back_rejected_submissions(
+        tmp_path, valid_data, invalid_data):
+    path = str(tmp_path / 'accepted.sqlite')
+
+    with pytest.raises(LoadError):
+        with UniquenessIndex(path) as index:
+            WaterSampleSchema(stages=[index]).load_rows(valid_data + invalid_data)
+
+    index = UniquenessIndex(path)
+    assert len(index) == 0
+
+    WaterSampleSchema(stages=[index]).load_rows(valid_data)
+    index.rollback()
+    assert len(index) == 0
+
+    WaterSampleSchema(stages=[index]).load_rows(valid_data)
+    index.commit()
+    assert len(index) == len(valid_data)
+    index.close()
+
+
+def test_uniqueness_index_batches(tmp_path, valid_data):
+    rows = [dict(valid_data[i % 3], sample_id=f'sample-{i}') for i in range(1200)]
+
+    with UniquenessIndex(str(tmp_path / 'accepted.sqlite')) as index:
+        schema = WaterSampleSchema(stages=[index], batch_size=1000)
+        schema.load_rows(rows)
+
+        assert len(index) == 0
+        index.commit()
+        assert len(index) == len(rows)
+
+        errors = [errors for _, _, errors in schema.iter_load(rows)]
+        assert all(errors)
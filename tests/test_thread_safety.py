@@ -0,0 +1,178 @@
+import datetime
+import random
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from marshmallow import ValidationError
+
+from nwss.cache import MemoryCache, SQLiteCache
+from nwss.compiler import compile_schema
+from nwss.parallel import iter_load_parallel, load_parallel
+from nwss.profiling import Profile
+from nwss.schemas import WaterSampleSchema, shared_schema
+from nwss.stages import DuplicateCheck
+
+
+THREADS = 8
+ROUNDS = 5
+
+
+@pytest.fixture
+def switch_often():
+    # Switch threads far more often than usual, so races show up quickly.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.fixture
+def rows(valid_data, invalid_data):
+    rows = []
+
+    for i in range(60):
+        row = dict((valid_data + invalid_data)[i % 5])
+
+        if 'sample_id' in row:
+            row['sample_id'] = f'sample-{i}'
+
+        rows.append(row)
+
+    return rows
+
+
+def load_all(schema, rows):
+    return [(index, data, errors) for index, data, errors in schema.iter_load(rows)]
+
+
+def stress(function, rows):
+    '''
+    Run function(rows) on shuffled copies of rows from several threads at
+    once, and return (rows, result) pairs.
+    '''
+    def run(seed):
+        shuffled = [dict(row) for row in rows]
+        random.Random(seed).shuffle(shuffled)
+        return shuffled, function(shuffled)
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        return list(executor.map(run, range(THREADS * ROUNDS)))
+
+
+@pytest.mark.parametrize('make_schema', [
+    lambda tmp_path: shared_schema(),
+    lambda tmp_path: WaterSampleSchema(canonicalize=True),
+    lambda tmp_path: WaterSampleSchema(cache=MemoryCache(maxsize=20)),
+    lambda tmp_path: WaterSampleSchema(cache=SQLiteCache(tmp_path / 'cache.sqlite')),
+    lambda tmp_path: WaterSampleSchema(profile=Profile()),
+])
+def test_shared_schema_iter_load(switch_often, tmp_path, rows, make_schema):
+    schema = make_schema(tmp_path)
+    reference = WaterSampleSchema(canonicalize=schema.canonicalize)
+
+    for shuffled, results in stress(lambda rows: load_all(schema, rows), rows):
+        assert results == load_all(reference, shuffled)
+
+
+def test_shared_schema_load_many(switch_often, rows):
+    schema = shared_schema(many=True)
+
+    def load(rows):
+        try:
+            return schema.load(rows)
+        except ValidationError as error:
+            return error.messages
+
+    for shuffled, result in stress(load, rows):
+        assert result == load(shuffled)
+
+
+def test_shared_compiled_schema(switch_often, rows):
+    schema = WaterSampleSchema(many=True)
+    compiled = compile_schema(schema)
+
+    def load(rows):
+        try:
+            return compiled.load(rows)
+        except ValidationError as error:
+            return error.messages
+
+    for shuffled, result in stress(load, rows):
+        try:
+            expected = schema.load(shuffled)
+        except ValidationError as error:
+            expected = error.messages
+
+        assert result == expected
+
+
+def test_shared_profile_counts(switch_often, rows):
+    profile = Profile()
+    schema = WaterSampleSchema(profile=profile)
+
+    stress(lambda rows: load_all(schema, rows), rows)
+
+    report = {timing.name: timing for timing in profile.report()}
+    assert report['reporting_jurisdiction'].calls == len(rows) * THREADS * ROUNDS
+
+
+def test_clock_is_per_thread():
+    schema = WaterSampleSchema()
+    held = threading.Event()
+    release = threading.Event()
+    bound = datetime.date(2000, 1, 1)
+
+    def hold_clock():
+        with schema._batch_clock(bound):
+            assert schema.latest_date() == bound
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold_clock)
+    thread.start()
+    held.wait()
+
+    try:
+        assert schema.latest_date() != bound
+    finally:
+        release.set()
+        thread.join()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_iter_load_parallel_threads(rows, chunk_size):
+    expected = load_all(WaterSampleSchema(), rows)
+
+    results = list(iter_load_parallel(
+        rows, chunk_size=chunk_size, max_workers=4, threads=True
+    ))
+
+    assert results == expected
+
+
+def test_load_parallel_threads(schema, valid_data, invalid_data):
+    assert load_parallel(valid_data, max_workers=2, threads=True) == \
+        schema.load(valid_data)
+
+    with pytest.raises(ValidationError) as e:
+        load_parallel(invalid_data, chunk_size=2, max_workers=2, threads=True)
+
+    assert e.value.messages == {
+        index: errors
+        for index, _, errors in WaterSampleSchema().iter_load(invalid_data)
+        if errors
+    }
+
+
+def test_iter_load_parallel_threads_stages(valid_data):
+    rows = [dict(valid_data[0], sample_id=f'sample-{i % 3}') for i in range(12)]
+    check = DuplicateCheck()
+
+    results = list(iter_load_parallel(
+        rows, chunk_size=2, max_workers=4, threads=True, stages=[check], batch_size=5
+    ))
+
+    assert [index for index, _, errors in results if not errors] == [0, 1, 2]
+    assert sorted(check.duplicates) == [(i, i % 3) for i in range(3, 12)]
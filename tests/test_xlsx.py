@@ -0,0 +1,95 @@
+import datetime
+
+import pytest
+
+openpyxl = pytest.importorskip('openpyxl')
+
+from nwss import xlsx  # noqa: E402
+
+
+TYPED = {
+    'sample_collect_date': lambda v: datetime.date.fromisoformat(v),
+    'test_result_date': lambda v: datetime.datetime.fromisoformat(v),
+    'sample_collect_time': lambda v: datetime.time.fromisoformat(v),
+    'zipcode': int,
+    'population_served': float,
+    'capacity_mgd': float,
+    'flow_rate': float,
+    'rec_eff_percent': float,
+}
+
+
+def write_workbook(path, rows, typed=True):
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.title = 'Samples'
+    keys = list(rows[0])
+
+    sheet.append(keys)
+
+    for row in rows:
+        values = []
+
+        for key in keys:
+            value = row[key]
+
+            if value == '':
+                value = None
+            elif typed and key in TYPED:
+                value = TYPED[key](value)
+
+            values.append(value)
+
+        sheet.append(values)
+
+    # Excel often leaves empty rows at the end of a sheet.
+    sheet.append([None] * len(keys))
+    book.save(path)
+
+
+def test_typed_cells_load_like_csv(tmp_path, schema, valid_data):
+    path = tmp_path / 'samples.xlsx'
+    write_workbook(path, valid_data)
+
+    rows = list(xlsx.iter_rows(path))
+
+    assert isinstance(rows[0]['sample_collect_time'], datetime.time)
+    assert rows[0]['zipcode'] == valid_data[0]['zipcode']
+    assert schema.load(rows) == schema.load(valid_data)
+
+
+def test_text_cells(tmp_path, schema, valid_data):
+    path = tmp_path / 'samples.xlsx'
+    write_workbook(path, valid_data, typed=False)
+
+    rows = list(xlsx.iter_rows(path, sheet='Samples'))
+    assert schema.load(rows) == schema.load(valid_data)
+
+
+def test_iter_load(tmp_path, schema, invalid_data):
+    path = tmp_path / 'samples.xlsx'
+    write_workbook(path, invalid_data, typed=False)
+
+    expected = [errors for _, _, errors in schema.iter_load(invalid_data)]
+
+    assert [errors for _, _, errors in xlsx.iter_load(path)] == expected
+
+
+def test_fractional_integer_is_an_error(tmp_path, schema, valid_data):
+    path = tmp_path / 'samples.xlsx'
+    rows = [dict(valid_data[0], population_served='1.5')]
+    write_workbook(path, rows)
+
+    (_, _, errors), = xlsx.iter_load(path)
+
+    assert errors == {'population_served': ['Not a valid integer.']}
+
+
+def test_cli(tmp_path, valid_data, capsys):
+    from nwss.cli import main
+
+    path = str(tmp_path / 'samples.xlsx')
+    write_workbook(path, valid_data)
+
+    assert main(['validate', path, '--sheet', 'Samples']) == 0
+    assert capsys.readouterr().err == '3 rows: 3 valid, 0 with errors.\n'